@@ -1,7 +1,12 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
 from child_story_maker.backend.app import app as core_app
 
-app = FastAPI()
+# Mounted apps do not receive lifespan events, so forward the core app's.
+app = FastAPI(
+    default_response_class=ORJSONResponse,
+    lifespan=core_app.router.lifespan_context,
+)
 app.mount("/api", core_app)
 app.mount("/", core_app)
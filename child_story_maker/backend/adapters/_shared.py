@@ -0,0 +1,74 @@
+"""Setup shared by the OpenAI adapters: .env loading, client, JSON parsing."""
+from __future__ import annotations
+
+import os
+import random
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import httpx
+import orjson
+from dotenv import load_dotenv
+from openai import APIStatusError, AsyncOpenAI
+
+from child_story_maker.common.paths import repo_root
+
+_DOTENV_LOADED = False
+
+
+def _load_env() -> None:
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        load_dotenv(dotenv_path=repo_root() / ".env")
+        _DOTENV_LOADED = True
+
+
+_load_env()
+
+OPENAI_TIMEOUT = httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "60")), connect=5.0)
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+_api_key = os.getenv("OPENAI_API_KEY")
+if not _api_key:
+    raise RuntimeError("OPENAI_API_KEY missing. Put it in .env")
+
+# One async client so every adapter shares the same connection pool and no call
+# blocks the event loop. The SDK retries transient failures with backoff.
+ACLIENT = AsyncOpenAI(
+    api_key=_api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES
+)
+
+
+@lru_cache(maxsize=1)
+def responses_available() -> bool:
+    """Whether the installed SDK exposes the Responses API."""
+    return hasattr(ACLIENT, "responses")
+
+
+def safe_json_load(raw_json: str) -> Dict[str, Any]:
+    try:
+        return orjson.loads(raw_json)
+    except orjson.JSONDecodeError:
+        start = raw_json.find("{")
+        end = raw_json.rfind("}")
+        if start != -1 and end > start:
+            return orjson.loads(raw_json[start : end + 1])
+        raise
+
+
+def retry_delay(err: APIStatusError, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying after err, or None if its status is not
+    transient. Honours Retry-After, otherwise jittered exponential backoff.
+    """
+    if err.status_code not in RETRYABLE_STATUS:
+        return None
+    response = getattr(err, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), 30.0)
+        except ValueError:
+            pass
+    return random.uniform(0.5, 1.5) * 2**attempt
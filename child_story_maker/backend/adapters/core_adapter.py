@@ -2,18 +2,26 @@
 from __future__ import annotations
 
 import os
-import httpx
-import json
+import asyncio
+import copy
 import base64
+import orjson
 import re
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any, AsyncIterator, ClassVar, Dict, List, Optional, Tuple
 
-from dotenv import load_dotenv
-from openai import OpenAI, APIStatusError
+from openai import APIStatusError
+from pydantic import BaseModel, ConfigDict, ValidationError, model_validator
 
-from child_story_maker.common.paths import repo_root
-
-load_dotenv(dotenv_path=repo_root() / ".env")
+from child_story_maker.backend.adapters._shared import (
+    ACLIENT,
+    responses_available,
+    retry_delay,
+    safe_json_load,
+)
+from child_story_maker.backend.services.http import get_client
+from child_story_maker.backend.storage import image_cache
+from child_story_maker.common.cache import LRUCache, SemanticCache, cache_key
 
 # --- Configuration -----------------------------------------------------------
 TEXT_MODEL = os.getenv("STORY_MODEL", "gpt-4o-mini")  # low-cost text model
@@ -26,6 +34,15 @@ IMAGE_FALLBACK_MODELS = [
     for m in os.getenv("IMAGE_FALLBACK_MODELS", "").split(",")
     if m.strip()
 ]
+STORY_CACHE_SIZE = int(os.getenv("STORY_CACHE_SIZE", "512"))
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "0").strip() in {"1", "true", "yes"}
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.93"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "256"))
+IMAGE_CONCURRENCY = max(1, int(os.getenv("IMAGE_CONCURRENCY", "4")))
+# Extra attempts on 429/5xx on top of the SDK's own retries.
+IMAGE_RETRIES = max(0, int(os.getenv("IMAGE_RETRIES", "1")))
 
 if IMAGE_MODEL.lower().startswith("gpt-image-") and not ALLOW_GPT_IMAGE:
     IMAGE_MODEL = "dall-e-2"
@@ -33,6 +50,16 @@ if IMAGE_MODEL.lower().startswith("gpt-image-") and not ALLOW_GPT_IMAGE:
         m for m in IMAGE_FALLBACK_MODELS if not m.lower().startswith("gpt-image-")
     ]
 
+# Models to try in order, deduped and filtered once at import.
+_IMAGE_MODEL_CANDIDATES = tuple(
+    dict.fromkeys(
+        m
+        for m in (IMAGE_MODEL, *IMAGE_FALLBACK_MODELS, "dall-e-2")
+        if m and (ALLOW_GPT_IMAGE or not m.lower().startswith("gpt-image-"))
+    )
+)
+_IMAGE_MODEL_NORMS = {m: m.strip().lower() for m in _IMAGE_MODEL_CANDIDATES}
+
 SAFE_IMAGE_SUFFIX = (
     "Children's book illustration. Family-friendly, gentle, and wholesome. "
     "Fully clothed characters, modest outfits, and a cheerful tone. "
@@ -68,25 +95,59 @@ BAD_IMAGE_TERMS = [
     "cigarette",
 ]
 
-ALLOWED_SIZES_GPT_IMAGE = {"1024x1024", "1024x1536", "1536x1024", "auto"}
-ALLOWED_SIZES_DALLE2 = {"256x256", "512x512", "1024x1024"}
-ALLOWED_SIZES_DALLE3 = {"1024x1024", "1792x1024", "1024x1792"}
-CONTENT_POLICY_MARKERS = ["content_policy", "safety", "rejected", "violation"]
+_BAD_IMAGE_RE = re.compile(
+    r"\b(?:"
+    + "|".join(re.escape(t) for t in sorted(BAD_IMAGE_TERMS, key=len, reverse=True))
+    + r")\b",
+    re.IGNORECASE,
+)
+
+ALLOWED_SIZES_GPT_IMAGE = frozenset({"1024x1024", "1024x1536", "1536x1024", "auto"})
+ALLOWED_SIZES_DALLE2 = frozenset({"256x256", "512x512", "1024x1024"})
+ALLOWED_SIZES_DALLE3 = frozenset({"1024x1024", "1792x1024", "1024x1792"})
+CONTENT_POLICY_MARKERS = ("content_policy", "safety", "rejected", "violation")
+_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
 SAFE_GENERIC_PROMPT = (
     "A cheerful children's book illustration of friendly animal characters "
     "wearing colorful clothes, playing in a sunny garden. Soft watercolor style. No text."
 )
 
-# Create a single async client (httpx under the hood)
-_api_key = os.getenv("OPENAI_API_KEY")
-if not _api_key:
-    raise RuntimeError("OPENAI_API_KEY missing. Put it in .env")
-_client = OpenAI(api_key=_api_key)
+# Caps concurrent image generations across all requests in this process.
+_IMAGE_SEM = asyncio.Semaphore(IMAGE_CONCURRENCY)
+
+# Exact-match cache of normalized stories, keyed on the request parameters.
+_STORY_CACHE = LRUCache(STORY_CACHE_SIZE)
+# Near-duplicate prompt cache (SEMANTIC_CACHE=1); built on the first embedding.
+_SEMANTIC_CACHE: Optional[SemanticCache] = None
+# Prompt embeddings by normalized text, so a prompt retried with other settings
+# (age, style, sections) skips the embeddings round trip.
+_EMBEDDING_CACHE = LRUCache(EMBEDDING_CACHE_SIZE)
+
+# Static instructions first, request-specific fields last: the provider's
+# prompt cache only discounts an identical prefix.
+_STORY_PROMPT_HEAD = (
+    "You are a children's story generator.\n\n"
+    "CONTENT GUIDELINES:\n"
+    "- Keep vocabulary appropriate for the target age.\n"
+    "- Make each section self-contained and ~3-6 sentences.\n"
+    "- Add a few more concrete details in each section while staying age-appropriate.\n"
+    "- Gently educational, warm and engaging.\n"
+    "- Avoid violence, weapons, blood, alcohol, drugs, or any adult themes.\n"
+    "- Give each section a short title.\n"
+    "- For each section include an 'image_prompt' that describes a single coherent scene "
+    "in a kids-book illustration style (no text overlays), concise but specific.\n"
+    "- Image prompts must be kid-safe and fully clothed, no nudity or sexual content.\n\n"
+    "OUTPUT FORMAT:\n"
+    "Return ONLY valid JSON that matches the provided JSON Schema. Do not include explanations.\n"
+    "\n---\nREQUEST:\n"
+)
 
 # --- Helpers -----------------------------------------------------------------
+@lru_cache(maxsize=32)
 def _story_schema(sections: int) -> Dict[str, Any]:
     """
     JSON Schema to enforce the model returns exactly the structure your app expects.
+    Cached per section count; treat the result as read-only.
     """
     return {
         "name": "Story",
@@ -126,32 +187,105 @@ def _build_story_prompt(
     title_hint: str,
 ) -> str:
     title_line = f"Title hint: {title_hint}\n" if title_hint else ""
-    return (
-        "You are a children's story generator.\n\n"
+    return _STORY_PROMPT_HEAD + (
         f"Target language: {language}\n"
         f"Target reader age: {age}\n"
         f"Narrative style/tone: {style}\n"
-        f"Number of sections/pages: {sections}\n\n"
+        f"Number of sections/pages: {sections}\n"
         f"{title_line}"
-        "CONTENT GUIDELINES:\n"
-        "- Keep vocabulary appropriate for the target age.\n"
-        "- Make each section self-contained and ~3-6 sentences.\n"
-        "- Add a few more concrete details in each section while staying age-appropriate.\n"
-        "- Gently educational, warm and engaging.\n"
-        "- Avoid violence, weapons, blood, alcohol, drugs, or any adult themes.\n"
-        "- Give each section a short title.\n"
-        "- For each section include an 'image_prompt' that describes a single coherent scene "
-        "in a kids-book illustration style (no text overlays), concise but specific.\n"
-        "- Image prompts must be kid-safe and fully clothed, no nudity or sexual content.\n\n"
         "STORY IDEA / USER PROMPT:\n"
-        f"{prompt}\n\n"
-        "OUTPUT FORMAT:\n"
-        "Return ONLY valid JSON that matches the provided JSON Schema. Do not include explanations."
+        f"{prompt}\n"
     )
 
 
-def _responses_available(client: OpenAI) -> bool:
-    return hasattr(client, "responses")
+def _story_cache_key(
+    *,
+    prompt: str,
+    age: str,
+    language: str,
+    style: str,
+    sections: int,
+    title_hint: str,
+) -> str:
+    return cache_key(
+        TEXT_MODEL,
+        " ".join((prompt or "").split()),
+        (age or "").strip().lower(),
+        (language or "").strip().lower(),
+        (style or "").strip().lower(),
+        int(sections),
+        " ".join((title_hint or "").split()),
+    )
+
+
+def _semantic_params_key(
+    *, age: str, language: str, style: str, sections: int, title_hint: str
+) -> str:
+    return cache_key(
+        TEXT_MODEL,
+        (age or "").strip().lower(),
+        (language or "").strip().lower(),
+        (style or "").strip().lower(),
+        int(sections),
+        " ".join((title_hint or "").split()),
+    )
+
+
+async def _embed_prompt(prompt: str) -> Optional[tuple[float, ...]]:
+    key = cache_key(EMBEDDING_MODEL, " ".join((prompt or "").split()))
+    cached = _EMBEDDING_CACHE.get(key)
+    if cached is not None:
+        return cached
+    try:
+        resp = await ACLIENT.embeddings.create(model=EMBEDDING_MODEL, input=prompt)
+    except Exception:
+        return None
+    embedding = tuple(resp.data[0].embedding)
+    if embedding:
+        _EMBEDDING_CACHE.set(key, embedding)
+    return embedding
+
+
+def _semantic_cache(dim: int) -> Optional[SemanticCache]:
+    global _SEMANTIC_CACHE
+    if _SEMANTIC_CACHE is None:
+        try:
+            _SEMANTIC_CACHE = SemanticCache(
+                dim=dim,
+                maxsize=SEMANTIC_CACHE_SIZE,
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+            )
+        except ImportError:
+            return None
+    return _SEMANTIC_CACHE
+
+
+def _from_cache(cached: Dict[str, Any]) -> Dict[str, Any]:
+    data = copy.deepcopy(cached)
+    data["_meta"] = {
+        "model": cached.get("_meta", {}).get("model") or TEXT_MODEL,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "cached": True,
+    }
+    return data
+
+
+def _remember_story(
+    key: str,
+    data: Dict[str, Any],
+    *,
+    embedding: Optional[tuple[float, ...]] = None,
+    params_key: str = "",
+) -> None:
+    stored = copy.deepcopy(data)
+    _STORY_CACHE.set(key, stored)
+    if embedding:
+        semantic = _semantic_cache(len(embedding))
+        if semantic:
+            semantic.add(embedding, params_key, stored)
+
 
 def _usage_from_response(resp: Any, model: str) -> Dict[str, Any]:
     usage = getattr(resp, "usage", None)
@@ -175,27 +309,17 @@ def _usage_from_response(resp: Any, model: str) -> Dict[str, Any]:
         "total_tokens": total_tokens,
     }
 
-def _image_model_candidates() -> list[str]:
-    models = []
-    for model in [IMAGE_MODEL] + IMAGE_FALLBACK_MODELS + ["dall-e-2"]:
-        if model and model not in models:
-            models.append(model)
-    if not ALLOW_GPT_IMAGE:
-        models = [m for m in models if not m.lower().startswith("gpt-image-")]
-    return models
-
-def _download_image(url: str) -> bytes:
-    with httpx.Client(timeout=60) as client:
-        resp = client.get(url)
-        resp.raise_for_status()
+def _image_model_candidates() -> tuple[str, ...]:
+    return _IMAGE_MODEL_CANDIDATES
+
+async def _download_image(url: str) -> bytes:
+    resp = await get_client().get(url, timeout=60)
+    resp.raise_for_status()
     return resp.content
 
 
 def _sanitize_image_prompt(prompt: str) -> str:
-    text = prompt
-    for term in BAD_IMAGE_TERMS:
-        text = re.sub(rf"\\b{re.escape(term)}\\b", "", text, flags=re.IGNORECASE)
-    text = " ".join(text.split())
+    text = " ".join(_BAD_IMAGE_RE.sub("", prompt).split())
     return f"{text}. {SAFE_IMAGE_SUFFIX}"
 
 
@@ -204,24 +328,32 @@ def _is_content_policy_error(err: Exception) -> bool:
     return any(marker in msg for marker in CONTENT_POLICY_MARKERS)
 
 
-def _call_image_generate(model: str, prompt: str, size: str) -> bytes:
-    img = _client.images.generate(
-        model=model,
-        prompt=prompt,
-        size=size,
-    )
+async def _call_image_generate(model: str, prompt: str, size: str) -> bytes:
+    for attempt in range(IMAGE_RETRIES + 1):
+        try:
+            img = await ACLIENT.images.generate(
+                model=model,
+                prompt=prompt,
+                size=size,
+            )
+            break
+        except APIStatusError as e:
+            delay = retry_delay(e, attempt)
+            if delay is None or attempt == IMAGE_RETRIES:
+                raise
+            await asyncio.sleep(delay)
     if img.data:
         data0 = img.data[0]
         if getattr(data0, "b64_json", None):
             return base64.b64decode(data0.b64_json)
         if getattr(data0, "url", None):
-            return _download_image(data0.url)
+            return await _download_image(data0.url)
     raise RuntimeError(f"Image API returned no data for model '{model}'.")
 
 
 def _normalize_image_size(model: str, size: str) -> str:
     size_norm = (size or "").strip().lower()
-    model_norm = (model or "").strip().lower()
+    model_norm = _IMAGE_MODEL_NORMS.get(model) or (model or "").strip().lower()
     if model_norm.startswith("gpt-image-"):
         return size_norm if size_norm in ALLOWED_SIZES_GPT_IMAGE else "1024x1024"
     if model_norm == "dall-e-2":
@@ -234,25 +366,20 @@ def _split_into_sections(text: str, sections: int) -> list[dict[str, Any]]:
     cleaned = " ".join(text.strip().split())
     if not cleaned:
         return []
-    sentences = re.split(r"(?<=[.!?])\s+", cleaned)
+    sentences = _SENT_SPLIT.split(cleaned)
     sentences = [s.strip() for s in sentences if s.strip()]
     if not sentences:
         sentences = [cleaned]
 
     total = len(sentences)
-    size = max(1, (total + sections - 1) // sections)
-    chunks = []
-    idx = 0
-    while idx < total:
-        chunk = " ".join(sentences[idx : idx + size])
-        chunks.append(chunk)
-        idx += size
-    while len(chunks) < sections:
-        chunks.append(chunks[-1])
-    if len(chunks) > sections:
-        merged = chunks[: sections - 1]
-        merged.append(" ".join(chunks[sections - 1 :]))
-        chunks = merged
+    if total < sections:
+        # Not enough sentences to go around: repeat the last one.
+        chunks = sentences + [sentences[-1]] * (sections - total)
+    else:
+        bounds = [(i * total) // sections for i in range(sections + 1)]
+        chunks = [
+            " ".join(sentences[bounds[i] : bounds[i + 1]]) for i in range(sections)
+        ]
 
     normalized = []
     for i, text_chunk in enumerate(chunks, start=1):
@@ -267,15 +394,150 @@ def _split_into_sections(text: str, sections: int) -> list[dict[str, Any]]:
     return normalized
 
 
-def _safe_json_load(raw_json: str) -> Dict[str, Any]:
+class _SectionModel(BaseModel):
+    """Accepts the key spellings models use for section fields; first non-empty one wins."""
+
+    model_config = ConfigDict(extra="ignore")
+
+    _ALIASES: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        "text": ("text", "content", "story", "body"),
+        "image_prompt": ("image_prompt", "imagePrompt", "illustration_prompt", "prompt"),
+        "title": ("title", "heading", "name"),
+    }
+
+    text: Optional[str] = None
+    image_prompt: Optional[str] = None
+    title: Optional[str] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _first_non_empty(cls, data: Any) -> Any:
+        # Pydantic's AliasChoices takes the first alias present, so a null or ""
+        # primary key would hide a filled-in fallback; models emit both.
+        if not isinstance(data, dict):
+            return data
+        return {
+            field: next((data[k] for k in keys if data.get(k)), None)
+            for field, keys in cls._ALIASES.items()
+        }
+
+
+def _normalize_section(sec: Any, i: int) -> Dict[str, Any]:
+    if isinstance(sec, str):
+        text = sec.strip()
+        title = f"Section {i}"
+        image_prompt = f"Kids book illustration of: {text[:200]}"
+        return {"id": i, "title": title, "text": text, "image_prompt": image_prompt}
+
+    if not isinstance(sec, dict):
+        raise RuntimeError("Model JSON sections must be objects or strings.")
+
     try:
-        return json.loads(raw_json)
-    except Exception:
-        start = raw_json.find("{")
-        end = raw_json.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            return json.loads(raw_json[start : end + 1])
-        raise
+        parsed = _SectionModel.model_validate(sec)
+    except ValidationError as e:
+        raise RuntimeError(f"Model JSON section invalid: {e}") from e
+
+    text = (parsed.text or "").strip()
+    if not text:
+        raise RuntimeError("Model JSON sections missing text.")
+
+    if text.startswith("{") or text.startswith("["):
+        try:
+            nested = safe_json_load(text)
+            nested_sections = None
+            if isinstance(nested, dict):
+                nested_sections = (
+                    nested.get("sections")
+                    or nested.get("chapters")
+                    or nested.get("pages")
+                    or nested.get("parts")
+                    or nested.get("story")
+                )
+            if isinstance(nested_sections, list) and nested_sections:
+                combined = []
+                for item in nested_sections:
+                    if isinstance(item, dict):
+                        combined.append(
+                            (item.get("text") or item.get("content") or item.get("story") or "").strip()
+                        )
+                    elif isinstance(item, str):
+                        combined.append(item.strip())
+                combined_text = " ".join(t for t in combined if t)
+                if combined_text:
+                    text = combined_text
+        except Exception:
+            pass
+
+    image_prompt = (parsed.image_prompt or "").strip()
+    if not image_prompt:
+        image_prompt = f"Kids book illustration of: {text[:200]}"
+
+    title = (parsed.title or "").strip()
+    if not title:
+        title = f"Section {i}"
+
+    return {"id": i, "title": title, "text": text, "image_prompt": image_prompt}
+
+
+class _SectionStreamParser:
+    """
+    Incremental scanner over streamed story JSON. feed() returns every object of
+    the top-level "sections" array whose closing brace has arrived so far.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._start = -1
+        # Root-level keys: the last string closed at depth 1, the key it became,
+        # and the key whose array is open, so only "sections" items are captured.
+        self._str_start = -1
+        self._last_str = ""
+        self._key = ""
+        self._array_key = ""
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.text += chunk
+        text = self.text
+        done: List[Dict[str, Any]] = []
+        for pos in range(self._pos, len(text)):
+            ch = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._str_start != -1:
+                        self._last_str = text[self._str_start + 1 : pos]
+                        self._str_start = -1
+            elif ch == '"':
+                self._in_string = True
+                if len(self._stack) == 1:
+                    self._str_start = pos
+            elif ch == ":" and len(self._stack) == 1:
+                self._key = self._last_str
+            elif ch in "{[":
+                self._stack.append(ch)
+                if self._stack == ["{", "["]:
+                    self._array_key = self._key
+                elif self._stack == ["{", "[", "{"] and self._array_key == "sections":
+                    self._start = pos
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if self._start != -1 and len(self._stack) == 2:
+                    try:
+                        done.append(orjson.loads(text[self._start : pos + 1]))
+                    except orjson.JSONDecodeError:
+                        pass
+                    self._start = -1
+        self._pos = len(text)
+        return done
 
 
 def _normalize_story_data(
@@ -327,74 +589,9 @@ def _normalize_story_data(
     if not isinstance(sections_list, list) or len(sections_list) < 1:
         raise RuntimeError("Model JSON sections must be a non-empty list.")
 
-    normalized = []
-    for i, sec in enumerate(sections_list, start=1):
-        if isinstance(sec, str):
-            text = sec.strip()
-            title = f"Section {i}"
-            image_prompt = f"Kids book illustration of: {text[:200]}"
-            normalized.append(
-                {"id": i, "title": title, "text": text, "image_prompt": image_prompt}
-            )
-            continue
-
-        if not isinstance(sec, dict):
-            raise RuntimeError("Model JSON sections must be objects or strings.")
-
-        text = (
-            sec.get("text")
-            or sec.get("content")
-            or sec.get("story")
-            or sec.get("body")
-            or ""
-        ).strip()
-        if not text:
-            raise RuntimeError("Model JSON sections missing text.")
-
-        if text.startswith("{") or text.startswith("["):
-            try:
-                nested = _safe_json_load(text)
-                nested_sections = None
-                if isinstance(nested, dict):
-                    nested_sections = (
-                        nested.get("sections")
-                        or nested.get("chapters")
-                        or nested.get("pages")
-                        or nested.get("parts")
-                        or nested.get("story")
-                    )
-                if isinstance(nested_sections, list) and nested_sections:
-                    combined = []
-                    for item in nested_sections:
-                        if isinstance(item, dict):
-                            combined.append(
-                                (item.get("text") or item.get("content") or item.get("story") or "").strip()
-                            )
-                        elif isinstance(item, str):
-                            combined.append(item.strip())
-                    combined_text = " ".join(t for t in combined if t)
-                    if combined_text:
-                        text = combined_text
-            except Exception:
-                pass
-
-        image_prompt = (
-            sec.get("image_prompt")
-            or sec.get("imagePrompt")
-            or sec.get("illustration_prompt")
-            or sec.get("prompt")
-            or ""
-        ).strip()
-        if not image_prompt:
-            image_prompt = f"Kids book illustration of: {text[:200]}"
-
-        title = (sec.get("title") or sec.get("heading") or sec.get("name") or "").strip()
-        if not title:
-            title = f"Section {i}"
-
-        normalized.append(
-            {"id": i, "title": title, "text": text, "image_prompt": image_prompt}
-        )
+    normalized = [
+        _normalize_section(sec, i) for i, sec in enumerate(sections_list, start=1)
+    ]
 
     if len(normalized) != sections:
         combined = " ".join(sec["text"] for sec in normalized if sec.get("text"))
@@ -412,6 +609,7 @@ async def generate_story_core(
     style: str,
     sections: int,
     title_hint: str = "",
+    use_cache: bool = True,
 ):
     """
     Calls OpenAI Responses API to produce a structured story with json format and 2 main attributes (title and sections, with sections split into 'id','text' and 'image_prompt' ) as follows:
@@ -422,11 +620,41 @@ async def generate_story_core(
         ...
       ]
     }
+    use_cache=False skips the exact and semantic story caches and always calls
+    the model; the new story then replaces the cached one.
     """
     # sys_instructions = (
     #     "You generate children's stories and strictly follow JSON schemas. "
     #     "When asked for structured output, you ONLY produce JSON."
     # )
+    key = _story_cache_key(
+        prompt=prompt,
+        age=age,
+        language=language,
+        style=style,
+        sections=sections,
+        title_hint=title_hint,
+    )
+    cached = _STORY_CACHE.get(key) if use_cache else None
+    if cached is not None:
+        return _from_cache(cached)
+
+    embedding = None
+    params_key = ""
+    if SEMANTIC_CACHE:
+        params_key = _semantic_params_key(
+            age=age,
+            language=language,
+            style=style,
+            sections=sections,
+            title_hint=title_hint,
+        )
+        embedding = await _embed_prompt(prompt)
+        semantic = _semantic_cache(len(embedding)) if embedding and use_cache else None
+        cached = semantic.get(embedding, params_key) if semantic else None
+        if cached is not None:
+            return _from_cache(cached)
+
     user_prompt = _build_story_prompt(
         prompt=prompt,
         age=age,
@@ -439,13 +667,13 @@ async def generate_story_core(
     last_error: Exception | None = None
     for attempt in range(2):
         try:
-            if _responses_available(_client):
+            if responses_available():
                 response_format = (
                     {"type": "json_schema", "json_schema": _story_schema(sections)}
                     if attempt == 0
                     else {"type": "json_object"}
                 )
-                resp = _client.responses.create(
+                resp = await ACLIENT.responses.create(
                     model=TEXT_MODEL,
                     input=user_prompt,
                     response_format=response_format,
@@ -459,7 +687,7 @@ async def generate_story_core(
                         getattr(content_items[0], "text", "") if content_items else ""
                     )
             else:
-                resp = _client.chat.completions.create(
+                resp = await ACLIENT.chat.completions.create(
                     model=TEXT_MODEL,
                     messages=[{"role": "user", "content": user_prompt}],
                     temperature=0.7 if attempt == 0 else 0.3,
@@ -467,7 +695,7 @@ async def generate_story_core(
                 )
                 raw_json = resp.choices[0].message.content
 
-            data = _safe_json_load(raw_json)
+            data = safe_json_load(raw_json)
             data = _normalize_story_data(data, sections, raw_text=raw_json)
             data["_meta"] = _usage_from_response(resp, TEXT_MODEL)
 
@@ -477,12 +705,16 @@ async def generate_story_core(
                     if not sec.get("title"):
                         sec["title"] = f"Section {i}"
 
+            _remember_story(key, data, embedding=embedding, params_key=params_key)
             return data
 
         except APIStatusError as e:
             last_error = RuntimeError(
                 f"OpenAI API error ({e.status_code}): {e.message}"
             )
+            delay = retry_delay(e, attempt)
+            if delay is not None and attempt == 0:
+                await asyncio.sleep(delay)
         except Exception as e:
             last_error = e
 
@@ -491,16 +723,144 @@ async def generate_story_core(
     raise RuntimeError("Failed to generate story: unknown error")
 
 
-async def generate_image_core(image_prompt: str, *, size: str = DEFAULT_IMAGE_SIZE) -> bytes:
+async def stream_story_core(
+    prompt: str,
+    *,
+    age: str,
+    language: str,
+    style: str,
+    sections: int,
+    title_hint: str = "",
+    use_cache: bool = True,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of generate_story_core. Yields {"type": "section", "section": {...}}
+    as soon as the model closes each section object, then a final
+    {"type": "story", "story": {...}} with the normalized story (same shape as
+    generate_story_core). The final sections are authoritative: if the model
+    returned the wrong number of sections they are re-split, and ids may differ.
+    use_cache=False skips the story cache lookup (the fresh story still replaces
+    the cached one).
+    """
+    key = _story_cache_key(
+        prompt=prompt,
+        age=age,
+        language=language,
+        style=style,
+        sections=sections,
+        title_hint=title_hint,
+    )
+    cached = _STORY_CACHE.get(key) if use_cache else None
+    if cached is not None:
+        data = _from_cache(cached)
+        for sec in data["sections"]:
+            yield {"type": "section", "section": dict(sec)}
+        yield {"type": "story", "story": data}
+        return
+
+    user_prompt = _build_story_prompt(
+        prompt=prompt,
+        age=age,
+        language=language,
+        style=style,
+        sections=sections,
+        title_hint=title_hint,
+    )
+    parser = _SectionStreamParser()
+    usage_chunk = None
+    emitted = 0
+    try:
+        stream = await ACLIENT.chat.completions.create(
+            model=TEXT_MODEL,
+            messages=[{"role": "user", "content": user_prompt}],
+            temperature=0.7,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage_chunk = chunk
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            for raw in parser.feed(delta):
+                try:
+                    sec = _normalize_section(raw, emitted + 1)
+                except RuntimeError:
+                    continue
+                emitted += 1
+                yield {"type": "section", "section": sec}
+    except APIStatusError as e:
+        raise RuntimeError(
+            f"Failed to generate story: OpenAI API error ({e.status_code}): {e.message}"
+        ) from e
+
+    try:
+        data = safe_json_load(parser.text)
+        data = _normalize_story_data(data, sections, raw_text=parser.text)
+    except Exception as e:
+        raise RuntimeError(f"Failed to generate story: {e}") from e
+    data["_meta"] = _usage_from_response(usage_chunk, TEXT_MODEL)
+    for i, sec in enumerate(data["sections"], start=1):
+        sec["id"] = i
+        if not sec.get("title"):
+            sec["title"] = f"Section {i}"
+
+    _remember_story(key, data)
+    yield {"type": "story", "story": data}
+
+
+async def generate_image_core(
+    image_prompt: str, *, size: str = DEFAULT_IMAGE_SIZE, use_cache: bool = True
+) -> bytes:
     """
     Calls OpenAI Images API and returns PNG bytes for the first generated image.
+    At most IMAGE_CONCURRENCY generations run at once per process; results are
+    cached on disk by (model, size, sanitized prompt). use_cache=False forces a
+    fresh image (which then replaces the cached one).
+    """
+    return await _generate_image(
+        _sanitize_image_prompt(image_prompt), size=size, use_cache=use_cache
+    )
+
+
+async def generate_images_batch(
+    prompts: List[str], *, size: str = DEFAULT_IMAGE_SIZE
+) -> List[bytes | BaseException]:
+    """
+    Generates one image per prompt concurrently. Results keep the prompt order;
+    failed generations are returned as exceptions instead of raising.
     """
-    safe_prompt = _sanitize_image_prompt(image_prompt)
+    return await asyncio.gather(
+        *(generate_image_core(p, size=size) for p in prompts),
+        return_exceptions=True,
+    )
+
+
+async def _cached_image(key: str, use_cache: bool) -> Optional[bytes]:
+    if not use_cache:
+        return None
+    return await asyncio.to_thread(image_cache.get, key)
+
+
+async def _generate_image(
+    safe_prompt: str, *, size: str, use_cache: bool = True
+) -> bytes:
+    # Each candidate model has its own cache entry, keyed on the model and the
+    # size it is actually called with. A model's entry is only consulted when
+    # the models before it failed, so a fallback image never shadows the
+    # primary model.
     last_error: Exception | None = None
     for model in _image_model_candidates():
         size_for_model = _normalize_image_size(model, size)
+        key = image_cache.image_key(model, size_for_model, safe_prompt)
+        cached = await _cached_image(key, use_cache)
+        if cached is not None:
+            return cached
         try:
-            return _call_image_generate(model, safe_prompt, size_for_model)
+            async with _IMAGE_SEM:
+                data = await _call_image_generate(model, safe_prompt, size_for_model)
         except APIStatusError as e:
             if e.status_code == 403 and "verify" in str(e.message).lower():
                 if last_error is None:
@@ -510,33 +870,49 @@ async def generate_image_core(image_prompt: str, *, size: str = DEFAULT_IMAGE_SI
                 continue
             if _is_content_policy_error(e):
                 try:
-                    return _call_image_generate(model, SAFE_GENERIC_PROMPT, size_for_model)
+                    async with _IMAGE_SEM:
+                        data = await _call_image_generate(
+                            model, SAFE_GENERIC_PROMPT, size_for_model
+                        )
                 except Exception as e2:
                     last_error = e2
                     continue
-            last_error = RuntimeError(
-                f"OpenAI Images API error ({e.status_code}): {e.message}"
-            )
+            else:
+                last_error = RuntimeError(
+                    f"OpenAI Images API error ({e.status_code}): {e.message}"
+                )
+                continue
         except Exception as e:
             last_error = e
-
-    if _responses_available(_client):
+            continue
+        await asyncio.to_thread(image_cache.put, key, data)
+        return data
+
+    if responses_available():
+        # The image_generation tool picks its own size, hence no size in the key.
+        key = image_cache.image_key(f"responses:{IMAGE_MODEL}", "", safe_prompt)
+        cached = await _cached_image(key, use_cache)
+        if cached is not None:
+            return cached
         try:
-            response = _client.responses.create(
-                model=IMAGE_MODEL,
-                input=safe_prompt,
-                tools=[
-                    {
-                        "type": "image_generation",
-                        "quality": IMAGE_QUALITY,
-                    }
-                ],
-            )
+            async with _IMAGE_SEM:
+                response = await ACLIENT.responses.create(
+                    model=IMAGE_MODEL,
+                    input=safe_prompt,
+                    tools=[
+                        {
+                            "type": "image_generation",
+                            "quality": IMAGE_QUALITY,
+                        }
+                    ],
+                )
             for output in response.output or []:
                 if getattr(output, "type", "") == "image_generation_call":
                     image_base64 = getattr(output, "result", None)
                     if image_base64:
-                        return base64.b64decode(image_base64)
+                        data = base64.b64decode(image_base64)
+                        await asyncio.to_thread(image_cache.put, key, data)
+                        return data
         except APIStatusError as e:
             last_error = RuntimeError(
                 f"OpenAI Images API error ({e.status_code}): {e.message}"
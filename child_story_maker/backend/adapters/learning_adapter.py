@@ -1,28 +1,42 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import copy
+import hashlib
 import os
-from typing import Any, Dict, List
+from functools import cache
+from typing import Any, Dict, List, Optional
 
-from dotenv import load_dotenv
-from openai import OpenAI, APIStatusError
+from openai import APIStatusError
 
-from child_story_maker.common.paths import repo_root
-
-load_dotenv(dotenv_path=repo_root() / ".env")
+from child_story_maker.backend.adapters._shared import (
+    ACLIENT,
+    responses_available,
+    retry_delay,
+    safe_json_load,
+)
+from child_story_maker.common.cache import LRUCache, cache_key
 
 LEARNING_MODEL = os.getenv("LEARNING_MODEL", os.getenv("STORY_MODEL", "gpt-4o-mini"))
+LEARNING_CACHE_SIZE = int(os.getenv("STORY_CACHE_SIZE", "512"))
+LEARNING_MAX_TOKENS = int(os.getenv("LEARNING_MAX_TOKENS", "1200"))
 
-_api_key = os.getenv("OPENAI_API_KEY")
-if not _api_key:
-    raise RuntimeError("OPENAI_API_KEY missing. Put it in .env")
-_client = OpenAI(api_key=_api_key)
-
+_LEARNING_CACHE = LRUCache(LEARNING_CACHE_SIZE)
 
-def _responses_available(client: OpenAI) -> bool:
-    return hasattr(client, "responses")
+# Static instructions first so repeated calls share a cacheable prefix.
+_LEARNING_PROMPT_HEAD = (
+    "You are a child-friendly educator. Create a learning pack for a short story.\n"
+    "Return:\n"
+    "- A 2-3 sentence summary.\n"
+    "- 3-5 comprehension questions with short answers.\n"
+    "- 3-6 vocabulary words with kid-friendly definitions and simple examples.\n"
+    "Keep everything age-appropriate and gentle.\n\n"
+    "OUTPUT FORMAT: Return ONLY valid JSON that matches the provided JSON schema.\n"
+    "\n---\nREQUEST:\n"
+)
 
 
+@cache
 def _learning_schema() -> Dict[str, Any]:
     return {
         "name": "LearningPack",
@@ -66,22 +80,37 @@ def _learning_schema() -> Dict[str, Any]:
     }
 
 
-def _safe_json_load(raw_json: str) -> Dict[str, Any]:
+@cache
+def _token_encoder() -> Optional[Any]:
+    """tiktoken encoder for LEARNING_MODEL, or None when tiktoken is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
     try:
-        return json.loads(raw_json)
+        try:
+            return tiktoken.encoding_for_model(LEARNING_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
     except Exception:
-        start = raw_json.find("{")
-        end = raw_json.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            return json.loads(raw_json[start : end + 1])
-        raise
+        # The BPE files are fetched on first use; stay usable offline.
+        return None
 
 
-def _trim_text(text: str, max_chars: int = 3200) -> str:
+def _trim_text(
+    text: str, max_tokens: int = LEARNING_MAX_TOKENS, max_chars: int = 3200
+) -> str:
+    """Cap the story by tokens when tiktoken is installed, else by characters."""
     cleaned = " ".join((text or "").split())
-    if len(cleaned) <= max_chars:
+    enc = _token_encoder()
+    if enc is None:
+        if len(cleaned) <= max_chars:
+            return cleaned
+        return cleaned[: max_chars - 1].rstrip() + "…"
+    ids = enc.encode(cleaned)
+    if len(ids) <= max_tokens:
         return cleaned
-    return cleaned[: max_chars - 1].rstrip() + "…"
+    return enc.decode(ids[:max_tokens]).rstrip() + "…"
 
 
 def _normalize_learning(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -129,35 +158,41 @@ async def generate_learning_pack(
     language: str,
     style: str,
     sections: List[Dict[str, Any]],
+    use_cache: bool = True,
 ) -> Dict[str, Any]:
     story_text = "\n\n".join((s.get("text") or "").strip() for s in sections if s)
+    key = cache_key(
+        LEARNING_MODEL,
+        title,
+        age_group,
+        language,
+        style,
+        hashlib.blake2b(story_text.encode("utf-8"), digest_size=16).hexdigest(),
+    )
+    cached = _LEARNING_CACHE.get(key) if use_cache else None
+    if cached is not None:
+        return copy.deepcopy(cached)
+
     trimmed_text = _trim_text(story_text)
-    prompt = (
-        "You are a child-friendly educator. Create a learning pack for a short story.\n"
+    prompt = _LEARNING_PROMPT_HEAD + (
         f"Story title: {title}\n"
         f"Reader age: {age_group}\n"
         f"Language: {language}\n"
         f"Style: {style}\n\n"
-        "Return:\n"
-        "- A 2-3 sentence summary.\n"
-        "- 3-5 comprehension questions with short answers.\n"
-        "- 3-6 vocabulary words with kid-friendly definitions and simple examples.\n"
-        "Keep everything age-appropriate and gentle.\n\n"
         "STORY TEXT:\n"
-        f"{trimmed_text}\n\n"
-        "OUTPUT FORMAT: Return ONLY valid JSON that matches the provided JSON schema."
+        f"{trimmed_text}\n"
     )
 
     last_error: Exception | None = None
     for attempt in range(2):
         try:
-            if _responses_available(_client):
+            if responses_available():
                 response_format = (
                     {"type": "json_schema", "json_schema": _learning_schema()}
                     if attempt == 0
                     else {"type": "json_object"}
                 )
-                resp = _client.responses.create(
+                resp = await ACLIENT.responses.create(
                     model=LEARNING_MODEL,
                     input=prompt,
                     response_format=response_format,
@@ -171,7 +206,7 @@ async def generate_learning_pack(
                         getattr(content_items[0], "text", "") if content_items else ""
                     )
             else:
-                resp = _client.chat.completions.create(
+                resp = await ACLIENT.chat.completions.create(
                     model=LEARNING_MODEL,
                     messages=[{"role": "user", "content": prompt}],
                     temperature=0.4,
@@ -179,12 +214,17 @@ async def generate_learning_pack(
                 )
                 raw_json = resp.choices[0].message.content
 
-            data = _safe_json_load(raw_json)
-            return _normalize_learning(data)
+            data = safe_json_load(raw_json)
+            learning = _normalize_learning(data)
+            _LEARNING_CACHE.set(key, copy.deepcopy(learning))
+            return learning
         except APIStatusError as e:
             last_error = RuntimeError(
                 f"OpenAI API error ({e.status_code}): {e.message}"
             )
+            delay = retry_delay(e, attempt)
+            if delay is not None and attempt == 0:
+                await asyncio.sleep(delay)
         except Exception as e:
             last_error = e
 
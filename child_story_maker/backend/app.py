@@ -1,10 +1,17 @@
 # child_story_maker/backend/app.py
+import asyncio
+import bisect
+import hashlib
 import os
-import uuid
+import secrets
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set, Tuple
 
 import httpx
+import orjson
 from dotenv import load_dotenv
 
 from ..common.paths import repo_root
@@ -16,22 +23,25 @@ from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field, ConfigDict
-from fastapi.responses import Response
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 
 from .adapters.core_adapter import (
     generate_story_core,
     generate_image_core,
+    stream_story_core,
 )
 from .adapters.learning_adapter import generate_learning_pack
 from .storage.files import (
     ensure_media_dir,
-    save_image_bytes,
-    save_audio_bytes,
+    save_image_bytes_async,
+    save_audio_bytes_async,
 )
 from .storage import supabase_db
 from .storage import supabase_admin
+from .services import http
 from .services.tts import synthesize_tts
-from .exports import export_zip, export_pdf
+from .exports import export_pdf_stream, export_zip_stream
+from child_story_maker.common.cache import LRUCache, TTLCache, cache_key
 from child_story_maker.common.evaluation import build_story_report
 from child_story_maker.common.db import (
     init_db,
@@ -51,7 +61,20 @@ from child_story_maker.common.utils import kid_safe_prompt
 # -------------------------------
 # FastAPI app & middleware
 # -------------------------------
-app = FastAPI(title="Children Storyteller API", version="1.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One keep-alive pool for Supabase, TTS and image downloads.
+    http.get_client()
+    yield
+    await http.aclose()
+
+
+app = FastAPI(
+    title="Children Storyteller API",
+    version="1.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # CORS: wide-open for hackathon; restrict origins later if needed
 app.add_middleware(
@@ -69,6 +92,8 @@ if media_dir.exists():
     app.mount("/media", StaticFiles(directory=str(media_dir)), name="media")
 
 USE_LOCAL_DB = os.getenv("USE_LOCAL_DB", "1") == "1"
+# Storage backend for stories, resolved once; the env does not change at runtime.
+USE_SUPABASE_BACKEND = (not USE_LOCAL_DB) and supabase_db.enabled()
 if USE_LOCAL_DB:
     init_db()
 
@@ -84,16 +109,40 @@ def _require_local_db() -> None:
 # -------------------------------
 # In-memory "DB" (hackathon-simple)
 # story_id -> {"title": str, "sections": [...], "status": str}
+# Entries idle for LOCAL_STORE_TTL seconds, or beyond LOCAL_STORE_SIZE, are dropped.
+# That applies to SHARE_DB too: an unvisited share link stops working after
+# LOCAL_STORE_TTL even if its expires_at is later.
 # -------------------------------
-DB: Dict[str, Dict[str, Any]] = {}
-SHARE_DB: Dict[str, Dict[str, Any]] = {}
-LEARNING_DB: Dict[str, Dict[str, Any]] = {}
-REPORT_DB: Dict[str, Dict[str, Any]] = {}
+LOCAL_STORE_SIZE = int(os.getenv("LOCAL_STORE_SIZE", "10000"))
+LOCAL_STORE_TTL = float(os.getenv("LOCAL_STORE_TTL", str(24 * 3600)))
+DB = TTLCache(LOCAL_STORE_SIZE, LOCAL_STORE_TTL)
+SHARE_DB = TTLCache(LOCAL_STORE_SIZE, LOCAL_STORE_TTL)
+LEARNING_DB = TTLCache(LOCAL_STORE_SIZE, LOCAL_STORE_TTL)
+REPORT_DB = TTLCache(LOCAL_STORE_SIZE, LOCAL_STORE_TTL)
+# story_id -> share tokens, so deleting a story doesn't scan every share.
+# Tokens that age out of SHARE_DB linger until _reindex_shares() rebuilds it.
+SHARES_BY_STORY: Dict[str, Set[str]] = defaultdict(set)
+_SHARES_INDEXED = 0
+# (created_at, story_id) in ascending order plus child_id -> story ids, so
+# /stories never scans or sorts the whole store. Ids whose story has expired
+# out of DB are dropped lazily.
+CREATED_INDEX: List[Tuple[str, str]] = []
+CHILD_INDEX: Dict[str, Set[str]] = defaultdict(set)
+# Reports keyed by the content they are computed from, so identical stories
+# (e.g. the same text with regenerated images) are only scored once.
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "4096"))
+_REPORT_CACHE = LRUCache(REPORT_CACHE_SIZE)
 
 
 # -------------------------------
 # Pydantic models
 # -------------------------------
+# pydantic-core matches these with Rust's linear-time regex engine, where `$`
+# anchors at the very end of the input (a trailing newline is rejected).
+SIZE_PATTERN = r"^(?:auto|\d{2,4}x\d{2,4})$"
+FMT_PATTERN = r"^(?:mp3|wav|aac|flac|opus)$"
+
+
 class SectionResp(BaseModel):
     id: int
     title: Optional[str] = None
@@ -117,21 +166,23 @@ class CreateStoryReq(BaseModel):
     style: Optional[str] = Field(default=None, max_length=60)
     sections: int = Field(default=5, ge=1, le=10)
     generate_images: bool = True
-    image_size: str = Field(default="512x512", pattern=r"^(auto|\d{2,4}x\d{2,4})$")
+    image_size: str = Field(default="512x512", pattern=SIZE_PATTERN)
     image_style: Optional[str] = Field(default=None, max_length=40)
     title: str = Field(default="")
     child_id: Optional[str] = Field(default=None, max_length=64)
+    # true asks for a new story even if one was cached for the same inputs
+    refresh: bool = False
     model_config = ConfigDict(extra="forbid")
 
 
 class ImagesReq(BaseModel):
-    size: str = Field(default="512x512", pattern=r"^(auto|\d{2,4}x\d{2,4})$")
+    size: str = Field(default="512x512", pattern=SIZE_PATTERN)
     image_style: Optional[str] = Field(default=None, max_length=40)
 
 
 class ImageReq(BaseModel):
     image_prompt: str = Field(min_length=3, max_length=800)
-    size: str = Field(default="512x512", pattern=r"^(auto|\d{2,4}x\d{2,4})$")
+    size: str = Field(default="512x512", pattern=SIZE_PATTERN)
     image_style: Optional[str] = Field(default=None, max_length=40)
 
 
@@ -146,7 +197,7 @@ class TTSReq(BaseModel):
     )
     format: str = Field(
         default="mp3",
-        pattern=r"^(mp3|wav|aac|flac|opus)$",
+        pattern=FMT_PATTERN,
         description="Audio file format to save",
     )
 
@@ -186,24 +237,27 @@ class LearningUpdateReq(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
 
+def _bearer_token(request: Request) -> str:
+    """Token from an `Authorization: Bearer <token>` header, or "" if absent/malformed."""
+    scheme, _, token = request.headers.get("authorization", "").strip().partition(" ")
+    token = token.strip()
+    if scheme.lower() != "bearer" or not token or " " in token:
+        return ""
+    return token
+
+
 def _require_parent_id(request: Request) -> int:
-    auth = request.headers.get("authorization", "")
-    parts = auth.split()
-    token = ""
-    if len(parts) == 2 and parts[0].lower() == "bearer":
-        token = parts[1]
-    parent_id = get_parent_id_for_token(token)
+    parent_id = get_parent_id_for_token(_bearer_token(request))
     if not parent_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
     return parent_id
 
 
 def _require_bearer_token(request: Request) -> str:
-    auth = request.headers.get("authorization", "")
-    parts = auth.split()
-    if len(parts) == 2 and parts[0].lower() == "bearer" and parts[1].strip():
-        return parts[1].strip()
-    raise HTTPException(status_code=401, detail="Unauthorized")
+    token = _bearer_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return token
 
 
 def _build_share_url(request: Request, token: str) -> str:
@@ -213,16 +267,313 @@ def _build_share_url(request: Request, token: str) -> str:
     return f"{base}/?share={token}"
 
 
-def _expires_at_from_days(days: Optional[int]) -> Optional[str]:
+def _share_expiry(days: Optional[int]) -> Tuple[Optional[str], Optional[float]]:
+    """(ISO timestamp for Supabase, epoch seconds for SHARE_DB) or (None, None)."""
     if not days:
-        return None
+        return None, None
     try:
         days_int = int(days)
     except Exception:
-        return None
+        return None, None
     if days_int <= 0:
-        return None
-    return (datetime.now(timezone.utc) + timedelta(days=days_int)).isoformat()
+        return None, None
+    expires = datetime.now(timezone.utc) + timedelta(days=days_int)
+    return expires.isoformat(), expires.timestamp()
+
+
+def _story_sections(story: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Normalize generated sections for the UI layer."""
+    return [
+        {
+            "id": s["id"],
+            "title": s.get("title") or f"Section {s['id']}",
+            "text": s["text"],
+            "image_prompt": s["image_prompt"],
+            "image_url": None,
+            "audio_url": None,
+        }
+        for s in story["sections"]
+    ]
+
+
+def _index_story(story_id: str, data: Dict[str, Any]) -> None:
+    bisect.insort(CREATED_INDEX, (data.get("created_at") or "", story_id))
+    if data.get("child_id"):
+        CHILD_INDEX[str(data["child_id"])].add(story_id)
+    if len(CREATED_INDEX) > 2 * LOCAL_STORE_SIZE:
+        _reindex_stories()
+
+
+def _unindex_story(story_id: str, data: Dict[str, Any]) -> None:
+    entry = (data.get("created_at") or "", story_id)
+    pos = bisect.bisect_left(CREATED_INDEX, entry)
+    if pos < len(CREATED_INDEX) and CREATED_INDEX[pos] == entry:
+        del CREATED_INDEX[pos]
+    if data.get("child_id"):
+        ids = CHILD_INDEX.get(str(data["child_id"]))
+        if ids is not None:
+            ids.discard(story_id)
+            if not ids:
+                del CHILD_INDEX[str(data["child_id"])]
+
+
+def _index_share(story_id: str, share_token: str) -> None:
+    global _SHARES_INDEXED
+    SHARES_BY_STORY[story_id].add(share_token)
+    _SHARES_INDEXED += 1
+    if _SHARES_INDEXED > 2 * LOCAL_STORE_SIZE:
+        _reindex_shares()
+
+
+def _reindex_shares() -> None:
+    """Rebuild SHARES_BY_STORY from the shares still live in SHARE_DB."""
+    global _SHARES_INDEXED
+    live = SHARE_DB.items()
+    SHARES_BY_STORY.clear()
+    for share_token, share in live:
+        SHARES_BY_STORY[share["story_id"]].add(share_token)
+    _SHARES_INDEXED = len(live)
+
+
+def _reindex_stories() -> None:
+    """Rebuild both indexes from the stories still live in DB."""
+    live = DB.items()
+    CREATED_INDEX[:] = sorted((data.get("created_at") or "", sid) for sid, data in live)
+    CHILD_INDEX.clear()
+    for sid, data in live:
+        if data.get("child_id"):
+            CHILD_INDEX[str(data["child_id"])].add(sid)
+
+
+async def _save_story(
+    req: CreateStoryReq,
+    story: Dict[str, Any],
+    norm_sections: List[Dict[str, Any]],
+    story_meta: Dict[str, Any],
+    *,
+    use_supabase: bool,
+    token: Optional[str],
+) -> str:
+    """Persist a freshly generated story and return its id."""
+    if use_supabase:
+        try:
+            return await supabase_db.create_story(
+                token=token or "",
+                title=req.title.strip() or story["title"],
+                prompt=req.prompt,
+                age_group=req.age,
+                language=req.language,
+                style=req.style or "default",
+                child_id=req.child_id,
+                sections=norm_sections,
+                usage=story_meta,
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Supabase error: {e}") from e
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Supabase error: {e}") from e
+
+    story_id = f"st_{secrets.token_urlsafe(6)}"
+    created_at = datetime.now(timezone.utc).isoformat()
+    DB[story_id] = {
+        "title": req.title.strip() or story["title"],
+        "sections": norm_sections,
+        # Same dicts as "sections", so in-place updates show up in both views.
+        "sections_by_id": {int(sec["id"]): sec for sec in norm_sections},
+        "status": "ready",
+        "age_group": req.age,
+        "language": req.language,
+        "style": req.style or "default",
+        "child_id": req.child_id,
+        "created_at": created_at,
+        "model": story_meta.get("model"),
+        "input_tokens": story_meta.get("input_tokens"),
+        "output_tokens": story_meta.get("output_tokens"),
+        "total_tokens": story_meta.get("total_tokens"),
+    }
+    _index_story(story_id, DB[story_id])
+    return story_id
+
+
+def _styled_image_prompt(prompt: str, image_style: Optional[str]) -> str:
+    return f"{prompt}. Style: {image_style}." if image_style else prompt
+
+
+def _bump_version(story_id: str) -> None:
+    """Mark a local story's media as changed; export ETags are derived from it."""
+    record = DB.get(story_id)
+    if record is not None:
+        record["_ver"] = record.get("_ver", 0) + 1
+
+
+def _export_etag(
+    kind: str, story_id: str, data: Dict[str, Any], request: Request
+) -> Tuple[Optional[str], Optional[Response]]:
+    """
+    Version ETag for a local-mode export and, when If-None-Match already holds
+    it, the 304 to send instead of rebuilding the file. Media URLs are reused
+    when images or audio are regenerated, so Supabase-backed exports (where
+    the version counter isn't available) go without one.
+    """
+    if USE_SUPABASE_BACKEND:
+        return None, None
+    etag = f'"{cache_key(kind, story_id, data.get("_ver", 0))}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return etag, Response(
+            status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+        )
+    return etag, None
+
+
+async def _section_image(
+    story_id: str,
+    section: Dict[str, Any],
+    *,
+    size: str,
+    image_style: Optional[str],
+    use_supabase: bool,
+    token: Optional[str],
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """Generate, store and record the illustration for one section."""
+    img_bytes = await generate_image_core(
+        _styled_image_prompt(section["image_prompt"], image_style),
+        size=size,
+        use_cache=use_cache,
+    )
+    return await _store_section_image(
+        story_id, section, img_bytes, use_supabase=use_supabase, token=token
+    )
+
+
+async def _section_images(
+    story_id: str,
+    sections: List[Dict[str, Any]],
+    *,
+    use_supabase: bool,
+    token: Optional[str],
+    **kwargs: Any,
+) -> None:
+    """
+    Illustrate all sections concurrently (generate_image_core bounds the fan-out
+    with IMAGE_CONCURRENCY). Every section is attempted and the new image URLs
+    are written to Supabase in one bulk request; the first error, if any, is
+    raised afterwards.
+    """
+    results = await asyncio.gather(
+        *(
+            _section_image(story_id, s, use_supabase=False, token=token, **kwargs)
+            for s in sections
+        ),
+        return_exceptions=True,
+    )
+    if use_supabase:
+        done = [s for s, r in zip(sections, results) if not isinstance(r, BaseException)]
+        if done:
+            await supabase_db.update_sections_bulk(
+                token=token or "", story_id=story_id, sections=done, columns=("image_url",)
+            )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+async def _section_audio(
+    story_id: str,
+    section: Dict[str, Any],
+    *,
+    voice: str,
+    fmt: str,
+) -> Dict[str, Any]:
+    """Synthesize and store the narration for one section."""
+    audio_bytes = await synthesize_tts(section["text"], voice=voice, fmt=fmt)
+    section["audio_url"] = await save_audio_bytes_async(
+        story_id, section["id"], audio_bytes, ext=fmt
+    )
+    _bump_version(story_id)
+    return section
+
+
+async def _section_audios(
+    story_id: str,
+    sections: List[Dict[str, Any]],
+    *,
+    use_supabase: bool,
+    token: Optional[str],
+    **kwargs: Any,
+) -> None:
+    """
+    Narrate all sections concurrently (synthesize_tts bounds the fan-out with
+    TTS_CONCURRENCY) and write the new audio URLs to Supabase in one bulk
+    request. Every section is attempted; the first error, if any, is raised
+    afterwards.
+    """
+    results = await asyncio.gather(
+        *(_section_audio(story_id, s, **kwargs) for s in sections),
+        return_exceptions=True,
+    )
+    if use_supabase:
+        done = [s for s, r in zip(sections, results) if not isinstance(r, BaseException)]
+        if done:
+            await supabase_db.update_sections_bulk(
+                token=token or "", story_id=story_id, sections=done, columns=("audio_url",)
+            )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+async def _store_section_image(
+    story_id: str,
+    section: Dict[str, Any],
+    img_bytes: bytes,
+    *,
+    use_supabase: bool,
+    token: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Store one illustration, then record its URL. The upload finishes before the
+    row is written so Supabase never points at a missing file; callers overlap
+    whole sections with each other instead.
+    """
+    section["image_url"] = await save_image_bytes_async(story_id, section["id"], img_bytes)
+    _bump_version(story_id)
+    if use_supabase:
+        await supabase_db.update_section(
+            token=token or "",
+            story_id=story_id,
+            idx=int(section["id"]),
+            image_url=section["image_url"],
+        )
+    return section
+
+
+def _story_response(
+    story_id: str,
+    title: str,
+    sections: List[Dict[str, Any]],
+    status: str,
+    *,
+    request: Optional[Request] = None,
+) -> Response:
+    """
+    StoryResp-shaped payload, serialized directly without response_model validation.
+    With a request, also sends a content-hash ETag and answers a matching
+    If-None-Match with 304 so pollers don't re-download an unchanged story.
+    """
+    payload = {"story_id": story_id, "title": title, "sections": sections, "status": status}
+    if request is None:
+        return ORJSONResponse(payload)
+    body = orjson.dumps(payload)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _ndjson(event: Dict[str, Any]) -> bytes:
+    return orjson.dumps(event) + b"\n"
 
 # -------------------------------
 # Routes
@@ -259,12 +610,7 @@ def login(req: AuthReq):
 @app.post("/auth/logout")
 def logout(request: Request):
     _require_local_db()
-    auth = request.headers.get("authorization", "")
-    parts = auth.split()
-    token = ""
-    if len(parts) == 2 and parts[0].lower() == "bearer":
-        token = parts[1]
-    delete_session(token)
+    delete_session(_bearer_token(request))
     return {"ok": True}
 
 
@@ -305,7 +651,7 @@ def delete_child(child_id: int, parent_id: int = Depends(_require_parent_id)):
     return {"ok": True}
 
 
-@app.post("/story", response_model=StoryResp)
+@app.post("/story", responses={200: {"model": StoryResp}})
 async def create_story(req: CreateStoryReq, request: Request):
     """
     Create a story (and optionally its images).
@@ -313,7 +659,7 @@ async def create_story(req: CreateStoryReq, request: Request):
     ok, err = kid_safe_prompt(req.prompt)
     if not ok:
         raise HTTPException(status_code=400, detail=err)
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     token: Optional[str] = _require_bearer_token(request) if use_supabase else None
     try:
         story = await generate_story_core(
@@ -323,125 +669,195 @@ async def create_story(req: CreateStoryReq, request: Request):
             style=req.style or "default",
             sections=req.sections,
             title_hint=req.title or "",
+            use_cache=not req.refresh,
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Story provider error: {e}")
 
     try:
         story_meta = story.pop("_meta", {}) if isinstance(story, dict) else {}
-        # Normalize sections for the UI layer
-        norm_sections: List[Dict[str, Any]] = [
-            {
-                "id": s["id"],
-                "title": s.get("title") or f"Section {s['id']}",
-                "text": s["text"],
-                "image_prompt": s["image_prompt"],
-                "image_url": None,
-                "audio_url": None,
-            }
-            for s in story["sections"]
-        ]
+        norm_sections = _story_sections(story)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Story response invalid: {e}")
 
-    if use_supabase:
+    story_id = await _save_story(
+        req,
+        story,
+        norm_sections,
+        story_meta,
+        use_supabase=use_supabase,
+        token=token,
+    )
+    # The local record shares norm_sections, so image URLs land in it directly.
+    record = None if use_supabase else DB[story_id]
+
+    if req.generate_images:
+        if record is not None:
+            record["status"] = "generating-images"
         try:
-            story_id = await supabase_db.create_story(
-                token=token or "",
-                title=req.title.strip() or story["title"],
-                prompt=req.prompt,
-                age_group=req.age,
-                language=req.language,
-                style=req.style or "default",
-                child_id=req.child_id,
-                sections=norm_sections,
-                usage=story_meta,
+            await _section_images(
+                story_id,
+                norm_sections,
+                size=req.image_size,
+                image_style=req.image_style,
+                use_supabase=use_supabase,
+                token=token,
             )
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=502, detail=f"Supabase error: {e}") from e
         except Exception as e:
-            raise HTTPException(status_code=502, detail=f"Supabase error: {e}") from e
-        status = "ready"
-    else:
-        story_id = f"st_{uuid.uuid4().hex[:8]}"
-        created_at = datetime.now(timezone.utc).isoformat()
-        DB[story_id] = {
-            "title": req.title.strip() or story["title"],
-            "sections": norm_sections,
-            "status": "ready",
-            "age_group": req.age,
-            "language": req.language,
-            "style": req.style or "default",
-            "child_id": req.child_id,
-            "created_at": created_at,
-            "model": story_meta.get("model"),
-            "input_tokens": story_meta.get("input_tokens"),
-            "output_tokens": story_meta.get("output_tokens"),
-            "total_tokens": story_meta.get("total_tokens"),
-        }
-        status = "ready"
+            if record is not None:
+                record["status"] = "ready"  # fail soft; client can retry images
+            raise HTTPException(status_code=502, detail=f"Image provider error: {e}")
+        if record is not None:
+            record["status"] = "ready"
 
-    if req.generate_images:
-        if not use_supabase:
-            DB[story_id]["status"] = "generating-images"
+    return _story_response(
+        story_id, req.title.strip() or story["title"], norm_sections, "ready"
+    )
+
+
+@app.post("/story/stream")
+async def create_story_stream(req: CreateStoryReq, request: Request):
+    """
+    Same as POST /story, streamed as NDJSON so the UI can show sections while
+    the model is still writing. Events, one JSON object per line:
+      {"type": "section", "section": {...}}   as each section is generated
+      {"type": "image", "section": {...}}     per illustration, if requested
+      {"type": "story", "story": StoryResp}   once the story is saved
+      {"type": "error", "detail": "..."}      on failure after the stream began
+    """
+    ok, err = kid_safe_prompt(req.prompt)
+    if not ok:
+        raise HTTPException(status_code=400, detail=err)
+    use_supabase = USE_SUPABASE_BACKEND
+    token: Optional[str] = _require_bearer_token(request) if use_supabase else None
+
+    def start_image(section: Dict[str, Any]) -> "asyncio.Task[bytes]":
+        prompt = _styled_image_prompt(section["image_prompt"], req.image_style)
+        return asyncio.create_task(generate_image_core(prompt, size=req.image_size))
+
+    async def events():
+        story: Optional[Dict[str, Any]] = None
+        # Illustrations start as soon as each section streams in, so image
+        # latency overlaps the rest of the text generation.
+        # section id -> (image_prompt, task)
+        started: Dict[int, Tuple[str, "asyncio.Task[bytes]"]] = {}
+        finishing: List["asyncio.Task[Dict[str, Any]]"] = []
         try:
-            for s in norm_sections:
-                prompt = s["image_prompt"]
-                if req.image_style:
-                    prompt = f"{prompt}. Style: {req.image_style}."
-                img_bytes = await generate_image_core(prompt, size=req.image_size)
-                s["image_url"] = save_image_bytes(story_id, s["id"], img_bytes)
-                if use_supabase:
-                    await supabase_db.update_section(
-                        token=token or "",
-                        story_id=story_id,
-                        idx=int(s["id"]),
-                        image_url=s["image_url"],
+            try:
+                async for event in stream_story_core(
+                    prompt=req.prompt,
+                    age=req.age,
+                    language=req.language,
+                    style=req.style or "default",
+                    sections=req.sections,
+                    title_hint=req.title or "",
+                    use_cache=not req.refresh,
+                ):
+                    if event["type"] == "section":
+                        section = {**event["section"], "image_url": None, "audio_url": None}
+                        if req.generate_images:
+                            started[section["id"]] = (section["image_prompt"], start_image(section))
+                        yield _ndjson({"type": "section", "section": section})
+                    else:
+                        story = event["story"]
+            except Exception as e:
+                yield _ndjson({"type": "error", "detail": f"Story provider error: {e}"})
+                return
+
+            try:
+                story_meta = story.pop("_meta", {}) if isinstance(story, dict) else {}
+                norm_sections = _story_sections(story)
+            except Exception as e:
+                yield _ndjson({"type": "error", "detail": f"Story response invalid: {e}"})
+                return
+
+            try:
+                story_id = await _save_story(
+                    req,
+                    story,
+                    norm_sections,
+                    story_meta,
+                    use_supabase=use_supabase,
+                    token=token,
+                )
+            except HTTPException as e:
+                yield _ndjson({"type": "error", "detail": e.detail})
+                return
+
+            if req.generate_images:
+                if not use_supabase:
+                    DB[story_id]["status"] = "generating-images"
+
+                async def finish(section: Dict[str, Any], task: "asyncio.Task[bytes]"):
+                    return await _store_section_image(
+                        story_id, section, await task, use_supabase=use_supabase, token=token
                     )
-        except Exception as e:
-            if not use_supabase:
-                DB[story_id]["status"] = "ready"  # fail soft; client can retry images
-            raise HTTPException(status_code=502, detail=f"Image provider error: {e}")
-        if not use_supabase:
-            DB[story_id]["status"] = "ready"
 
-    return {
-        "story_id": story_id,
-        "title": (DB[story_id]["title"] if not use_supabase else (req.title.strip() or story["title"])),
-        "sections": (DB[story_id]["sections"] if not use_supabase else norm_sections),
-        "status": (DB[story_id]["status"] if not use_supabase else status),
-    }
+                for s in norm_sections:
+                    # The final sections can differ from the streamed ones when
+                    # the model's section count was off; only reuse matches.
+                    prompt, task = started.pop(s["id"], (None, None))
+                    if task is None or prompt != s["image_prompt"]:
+                        if task is not None:
+                            task.cancel()
+                        task = start_image(s)
+                    finishing.append(asyncio.create_task(finish(s, task)))
+                try:
+                    for done in asyncio.as_completed(finishing):
+                        yield _ndjson({"type": "image", "section": await done})
+                except Exception as e:
+                    yield _ndjson({"type": "error", "detail": f"Image provider error: {e}"})
+                finally:
+                    if not use_supabase:
+                        DB[story_id]["status"] = "ready"
+
+            yield _ndjson(
+                {
+                    "type": "story",
+                    "story": {
+                        "story_id": story_id,
+                        "title": req.title.strip() or story["title"],
+                        "sections": norm_sections,
+                        "status": "ready",
+                    },
+                }
+            )
+        finally:
+            for _, task in started.values():
+                task.cancel()
+            for task in finishing:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 
-@app.get("/story/{story_id}", response_model=StoryResp)
+@app.get("/story/{story_id}", responses={200: {"model": StoryResp}})
 async def get_story(story_id: str, request: Request):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         token = _require_bearer_token(request)
         data = await supabase_db.get_story(token=token, story_id=story_id)
         if not data:
             raise HTTPException(status_code=404, detail="Story not found")
-        return {
-            "story_id": story_id,
-            "title": data["title"],
-            "sections": data["sections"],
-            "status": data["status"],
-        }
+        return _story_response(
+            story_id,
+            data["title"],
+            data["sections"],
+            data["status"],
+            request=request,
+        )
 
     data = DB.get(story_id)
     if not data:
         raise HTTPException(status_code=404, detail="Story not found")
-    return {
-        "story_id": story_id,
-        "title": data["title"],
-        "sections": data["sections"],
-        "status": data["status"],
-    }
+    return _story_response(
+        story_id, data["title"], data["sections"], data["status"], request=request
+    )
 
 
 @app.get("/stories")
 async def list_stories(request: Request, child_id: Optional[str] = None):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         token = _require_bearer_token(request)
         rows = await supabase_db.list_stories(token=token, child_id=child_id)
@@ -461,11 +877,18 @@ async def list_stories(request: Request, child_id: Optional[str] = None):
             }
             for r in (rows or [])
         ]
-        return {"stories": stories}
+        return ORJSONResponse({"stories": stories})
+
+    if child_id:
+        ids = CHILD_INDEX.get(str(child_id), set())
+        rows = [(sid, DB.peek(sid)) for sid in ids]
+        rows.sort(key=lambda r: (r[1] or {}).get("created_at") or "", reverse=True)
+    else:
+        rows = [(sid, DB.peek(sid)) for _, sid in reversed(CREATED_INDEX)]
 
     stories = []
-    for story_id, data in DB.items():
-        if child_id and str(data.get("child_id")) != str(child_id):
+    for story_id, data in rows:
+        if data is None:
             continue
         stories.append(
             {
@@ -482,22 +905,23 @@ async def list_stories(request: Request, child_id: Optional[str] = None):
                 "total_tokens": data.get("total_tokens"),
             }
         )
-    stories.sort(key=lambda s: s.get("created_at") or "", reverse=True)
-    return {"stories": stories}
+    if len(stories) < len(rows):
+        _reindex_stories()
+    return ORJSONResponse({"stories": stories})
 
 
 @app.delete("/story/{story_id}")
 async def delete_story(story_id: str, request: Request):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         token = _require_bearer_token(request)
         await supabase_db.delete_story(token=token, story_id=story_id)
+        supabase_admin.forget_story(story_id)
         return {"ok": True}
     if story_id in DB:
-        DB.pop(story_id, None)
-        for token, share in list(SHARE_DB.items()):
-            if share.get("story_id") == story_id:
-                SHARE_DB.pop(token, None)
+        _unindex_story(story_id, DB.pop(story_id))
+        for token in SHARES_BY_STORY.pop(story_id, ()):
+            SHARE_DB.pop(token, None)
         LEARNING_DB.pop(story_id, None)
         REPORT_DB.pop(story_id, None)
         return {"ok": True}
@@ -506,8 +930,8 @@ async def delete_story(story_id: str, request: Request):
 
 @app.post("/story/{story_id}/share")
 async def create_share(story_id: str, request: Request, expires_in_days: Optional[int] = None):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
-    expires_at = _expires_at_from_days(expires_in_days)
+    use_supabase = USE_SUPABASE_BACKEND
+    expires_at, expires_at_epoch = _share_expiry(expires_in_days)
     if use_supabase:
         token = _require_bearer_token(request)
         share_token = await supabase_db.create_share(
@@ -522,52 +946,57 @@ async def create_share(story_id: str, request: Request, expires_in_days: Optiona
 
     if story_id not in DB:
         raise HTTPException(status_code=404, detail="Story not found")
-    share_token = uuid.uuid4().hex
-    SHARE_DB[share_token] = {"story_id": story_id, "expires_at": expires_at}
+    share_token = secrets.token_urlsafe(24)
+    SHARE_DB[share_token] = {
+        "story_id": story_id,
+        "expires_at": expires_at,
+        "expires_at_epoch": expires_at_epoch,
+    }
+    _index_share(story_id, share_token)
     return {"token": share_token, "share_url": _build_share_url(request, share_token)}
 
 
-@app.get("/share/{token}", response_model=StoryResp)
-async def get_share_story(token: str):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+@app.get("/share/{token}", responses={200: {"model": StoryResp}})
+async def get_share_story(token: str, request: Request):
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         if not supabase_admin.enabled():
             raise HTTPException(status_code=503, detail="Share access not configured.")
         data = await supabase_admin.get_story_by_share_token(token)
         if not data:
             raise HTTPException(status_code=404, detail="Share not found")
-        return {
-            "story_id": data["story_id"],
-            "title": data["title"],
-            "sections": data["sections"],
-            "status": data["status"],
-        }
+        return _story_response(
+            data["story_id"],
+            data["title"],
+            data["sections"],
+            data["status"],
+            request=request,
+        )
 
     share = SHARE_DB.get(token)
     if not share:
         raise HTTPException(status_code=404, detail="Share not found")
-    expires_at = share.get("expires_at")
-    if expires_at:
-        try:
-            if datetime.fromisoformat(expires_at) < datetime.now(timezone.utc):
-                raise HTTPException(status_code=404, detail="Share expired")
-        except ValueError:
-            pass
+    expires_at_epoch = share.get("expires_at_epoch")
+    if expires_at_epoch is not None and expires_at_epoch < time.time():
+        SHARE_DB.pop(token, None)
+        tokens = SHARES_BY_STORY.get(share.get("story_id"))
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del SHARES_BY_STORY[share.get("story_id")]
+        raise HTTPException(status_code=404, detail="Share expired")
     story_id = share.get("story_id")
     data = DB.get(story_id)
     if not data:
         raise HTTPException(status_code=404, detail="Story not found")
-    return {
-        "story_id": story_id,
-        "title": data["title"],
-        "sections": data["sections"],
-        "status": data["status"],
-    }
+    return _story_response(
+        story_id, data["title"], data["sections"], data["status"], request=request
+    )
 
 
 @app.get("/share/{token}/export/zip")
-async def export_share_zip(token: str):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+async def export_share_zip(token: str, request: Request):
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         if not supabase_admin.enabled():
             raise HTTPException(status_code=503, detail="Share access not configured.")
@@ -585,18 +1014,23 @@ async def export_share_zip(token: str):
     story_id = data.get("story_id") if isinstance(data, dict) else None
     if not story_id and not use_supabase:
         story_id = share.get("story_id")
-    zip_bytes = export_zip(story_id or "shared_story", data)
     filename = f"{data.get('title', 'story').replace(' ', '_').lower()}_story.zip"
-    return Response(
-        zip_bytes,
+    etag, not_modified = _export_etag("zip", story_id or "shared_story", data, request)
+    if not_modified is not None:
+        return not_modified
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if etag:
+        headers.update({"ETag": etag, "Cache-Control": "private, no-cache"})
+    return StreamingResponse(
+        export_zip_stream(story_id or "shared_story", data),
         media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        headers=headers,
     )
 
 
 @app.get("/share/{token}/export/pdf")
-async def export_share_pdf(token: str):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+async def export_share_pdf(token: str, request: Request):
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         if not supabase_admin.enabled():
             raise HTTPException(status_code=503, detail="Share access not configured.")
@@ -614,79 +1048,109 @@ async def export_share_pdf(token: str):
     story_id = data.get("story_id") if isinstance(data, dict) else None
     if not story_id and not use_supabase:
         story_id = share.get("story_id")
-    pdf_bytes = export_pdf(story_id or "shared_story", data)
     filename = f"{data.get('title', 'story').replace(' ', '_').lower()}.pdf"
-    return Response(
-        pdf_bytes,
+    etag, not_modified = _export_etag("pdf", story_id or "shared_story", data, request)
+    if not_modified is not None:
+        return not_modified
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if etag:
+        headers.update({"ETag": etag, "Cache-Control": "private, no-cache"})
+    return StreamingResponse(
+        export_pdf_stream(story_id or "shared_story", data),
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        headers=headers,
     )
 
 
+def _build_report(story_id: str, data: Dict[str, Any], *, use_cache: bool = True) -> Dict[str, Any]:
+    """build_story_report behind a cache keyed on the fields the report reads."""
+    title = data.get("title", "Story")
+    age_group = data.get("age_group", "")
+    language = data.get("language", "")
+    style = data.get("style", "")
+    sections = data.get("sections", [])
+    key = cache_key(
+        title,
+        age_group,
+        language,
+        style,
+        [[s.get("text"), s.get("image_prompt")] for s in sections if s],
+    )
+    cached = _REPORT_CACHE.get(key) if use_cache else None
+    if cached is None:
+        cached = build_story_report(
+            story_id=story_id,
+            title=title,
+            age_group=age_group,
+            language=language,
+            style=style,
+            sections=sections,
+        )
+        _REPORT_CACHE.set(key, cached)
+    return {**cached, "story_id": story_id}
+
+
 @app.get("/story/{story_id}/report")
 async def story_report(story_id: str, request: Request, refresh: bool = False):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     data = None
     if use_supabase:
         token = _require_bearer_token(request)
+        # The story is fetched only after a miss: a stored report is the common
+        # case, and a speculative get_story would be wasted on every hit.
         if not refresh:
             existing = await supabase_db.get_story_report(token=token, story_id=story_id)
             if existing:
-                return existing
+                return ORJSONResponse(existing)
         data = await supabase_db.get_story(token=token, story_id=story_id)
     else:
         if not refresh and story_id in REPORT_DB:
-            return REPORT_DB[story_id]
+            return ORJSONResponse(REPORT_DB[story_id])
         data = DB.get(story_id)
 
     if not data:
         raise HTTPException(status_code=404, detail="Story not found")
 
-    report = build_story_report(
-        story_id=story_id,
-        title=data.get("title", "Story"),
-        age_group=data.get("age_group", ""),
-        language=data.get("language", ""),
-        style=data.get("style", ""),
-        sections=data.get("sections", []),
-    )
+    report = _build_report(story_id, data, use_cache=not refresh)
     if use_supabase:
         await supabase_db.upsert_story_report(token=token, story_id=story_id, report=report)
     else:
         REPORT_DB[story_id] = report
-    return report
+    return ORJSONResponse(report)
 
 
 @app.get("/story/{story_id}/learning")
 async def get_learning(story_id: str, request: Request):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         token = _require_bearer_token(request)
         learning = await supabase_db.get_story_learning(token=token, story_id=story_id)
         if not learning:
             raise HTTPException(status_code=404, detail="Learning pack not found")
-        return learning
+        return ORJSONResponse(learning)
 
     learning = LEARNING_DB.get(story_id)
     if not learning:
         raise HTTPException(status_code=404, detail="Learning pack not found")
-    return learning
+    return ORJSONResponse(learning)
 
 
 @app.post("/story/{story_id}/learning")
 async def generate_learning(story_id: str, request: Request, refresh: bool = False):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     data = None
     if use_supabase:
         token = _require_bearer_token(request)
+        # The story is fetched only after a miss: a stored pack is the common
+        # case, and a speculative get_story would be wasted on every hit.
         if not refresh:
             existing = await supabase_db.get_story_learning(token=token, story_id=story_id)
             if existing:
-                return existing
+                return ORJSONResponse(existing)
         data = await supabase_db.get_story(token=token, story_id=story_id)
     else:
         if not refresh and story_id in LEARNING_DB:
-            return LEARNING_DB[story_id]
+            return ORJSONResponse(LEARNING_DB[story_id])
         data = DB.get(story_id)
 
     if not data:
@@ -699,6 +1163,7 @@ async def generate_learning(story_id: str, request: Request, refresh: bool = Fal
             language=data.get("language", ""),
             style=data.get("style", ""),
             sections=data.get("sections", []),
+            use_cache=not refresh,
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Learning provider error: {e}")
@@ -713,14 +1178,14 @@ async def generate_learning(story_id: str, request: Request, refresh: bool = Fal
         )
     else:
         LEARNING_DB[story_id] = learning
-    return learning
+    return ORJSONResponse(learning)
 
 
 @app.post("/story/{story_id}/learning/manual")
 async def save_learning_manual(
     story_id: str, req: LearningUpdateReq, request: Request
 ):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         token = _require_bearer_token(request)
         data = await supabase_db.get_story(token=token, story_id=story_id)
@@ -738,7 +1203,7 @@ async def save_learning_manual(
             questions=learning["questions"],
             vocabulary=learning["vocabulary"],
         )
-        return learning
+        return ORJSONResponse(learning)
 
     if story_id not in DB:
         raise HTTPException(status_code=404, detail="Story not found")
@@ -748,12 +1213,12 @@ async def save_learning_manual(
         "vocabulary": [v.model_dump() for v in req.vocabulary],
     }
     LEARNING_DB[story_id] = learning
-    return learning
+    return ORJSONResponse(learning)
 
 
 @app.get("/story/{story_id}/export/zip")
 async def export_story_zip(story_id: str, request: Request):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         token = _require_bearer_token(request)
         data = await supabase_db.get_story(token=token, story_id=story_id)
@@ -764,18 +1229,23 @@ async def export_story_zip(story_id: str, request: Request):
         if not data:
             raise HTTPException(status_code=404, detail="Story not found")
 
-    zip_bytes = export_zip(story_id, data)
     filename = f"{data.get('title', 'story').replace(' ', '_').lower()}_story.zip"
-    return Response(
-        zip_bytes,
+    etag, not_modified = _export_etag("zip", story_id, data, request)
+    if not_modified is not None:
+        return not_modified
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if etag:
+        headers.update({"ETag": etag, "Cache-Control": "private, no-cache"})
+    return StreamingResponse(
+        export_zip_stream(story_id, data),
         media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        headers=headers,
     )
 
 
 @app.get("/story/{story_id}/export/pdf")
 async def export_story_pdf(story_id: str, request: Request):
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     if use_supabase:
         token = _require_bearer_token(request)
         data = await supabase_db.get_story(token=token, story_id=story_id)
@@ -786,21 +1256,28 @@ async def export_story_pdf(story_id: str, request: Request):
         if not data:
             raise HTTPException(status_code=404, detail="Story not found")
 
-    pdf_bytes = export_pdf(story_id, data)
     filename = f"{data.get('title', 'story').replace(' ', '_').lower()}.pdf"
-    return Response(
-        pdf_bytes,
+    etag, not_modified = _export_etag("pdf", story_id, data, request)
+    if not_modified is not None:
+        return not_modified
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if etag:
+        headers.update({"ETag": etag, "Cache-Control": "private, no-cache"})
+    return StreamingResponse(
+        export_pdf_stream(story_id, data),
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        headers=headers,
     )
 
 
-@app.post("/story/{story_id}/images", response_model=StoryResp)
-async def generate_images(story_id: str, req: ImagesReq, request: Request):
+@app.post("/story/{story_id}/images", responses={200: {"model": StoryResp}})
+async def generate_images(
+    story_id: str, req: ImagesReq, request: Request, refresh: bool = False
+):
     """
-    (Re)generate images for each section.
+    (Re)generate images for each section. refresh=true skips the image cache.
     """
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     token: Optional[str] = _require_bearer_token(request) if use_supabase else None
     if use_supabase:
         d = await supabase_db.get_story(token=token or "", story_id=story_id)
@@ -812,19 +1289,15 @@ async def generate_images(story_id: str, req: ImagesReq, request: Request):
             raise HTTPException(status_code=404, detail="Story not found")
         d["status"] = "generating-images"
     try:
-        for s in d["sections"]:
-            prompt = s["image_prompt"]
-            if req.image_style:
-                prompt = f"{prompt}. Style: {req.image_style}."
-            img_bytes = await generate_image_core(prompt, size=req.size)
-            s["image_url"] = save_image_bytes(story_id, s["id"], img_bytes)
-            if use_supabase:
-                await supabase_db.update_section(
-                    token=token or "",
-                    story_id=story_id,
-                    idx=int(s["id"]),
-                    image_url=s["image_url"],
-                )
+        await _section_images(
+            story_id,
+            d["sections"],
+            size=req.size,
+            image_style=req.image_style,
+            use_supabase=use_supabase,
+            token=token,
+            use_cache=not refresh,
+        )
     except Exception as e:
         if not use_supabase:
             d["status"] = "ready"
@@ -832,23 +1305,25 @@ async def generate_images(story_id: str, req: ImagesReq, request: Request):
 
     if not use_supabase:
         d["status"] = "ready"
-    return {
-        "story_id": story_id,
-        "title": d["title"],
-        "sections": d["sections"],
-        "status": "ready",
-    }
+    return _story_response(story_id, d["title"], d["sections"], "ready")
 
 
-@app.post("/story/{story_id}/sections/{section_id}/image", response_model=SectionResp)
+@app.post(
+    "/story/{story_id}/sections/{section_id}/image", responses={200: {"model": SectionResp}}
+)
 async def generate_section_image(
-    story_id: str, section_id: int, req: ImagesReq, request: Request
+    story_id: str,
+    section_id: int,
+    req: ImagesReq,
+    request: Request,
+    refresh: bool = False,
 ):
     """
     Generate (or regenerate) a single section image.
     Useful for serverless deployments to avoid long-running requests.
+    refresh=true skips the image cache.
     """
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     token: Optional[str] = _require_bearer_token(request) if use_supabase else None
 
     if use_supabase:
@@ -859,7 +1334,7 @@ async def generate_section_image(
         story = DB.get(story_id)
         if not story:
             raise HTTPException(status_code=404, detail="Story not found")
-        section = next((s for s in story["sections"] if int(s["id"]) == int(section_id)), None)
+        section = story["sections_by_id"].get(int(section_id))
         if not section:
             raise HTTPException(status_code=404, detail="Section not found")
 
@@ -867,12 +1342,15 @@ async def generate_section_image(
     if req.image_style:
         prompt = f"{prompt}. Style: {req.image_style}."
     try:
-        img_bytes = await generate_image_core(prompt, size=req.size)
-        image_url = save_image_bytes(story_id, int(section_id), img_bytes)
+        img_bytes = await generate_image_core(
+            prompt, size=req.size, use_cache=not refresh
+        )
+        image_url = await save_image_bytes_async(story_id, int(section_id), img_bytes)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Image provider error: {e}")
 
     section["image_url"] = image_url
+    _bump_version(story_id)
     if use_supabase:
         await supabase_db.update_section(
             token=token or "",
@@ -881,10 +1359,10 @@ async def generate_section_image(
             image_url=image_url,
         )
 
-    return section
+    return ORJSONResponse(section)
 
 
-@app.post("/image", response_model=ImageResp)
+@app.post("/image", responses={200: {"model": ImageResp}})
 async def generate_image(req: ImageReq):
     """
     Generate a single image from a prompt and return a media URL.
@@ -900,20 +1378,44 @@ async def generate_image(req: ImageReq):
     if not isinstance(img_bytes, (bytes, bytearray)):
         raise HTTPException(status_code=502, detail="Image provider returned no data.")
 
-    image_id = f"img_{uuid.uuid4().hex[:8]}"
+    image_id = f"img_{secrets.token_urlsafe(6)}"
     try:
-        image_url = save_image_bytes(image_id, 0, img_bytes)
+        image_url = await save_image_bytes_async(image_id, 0, img_bytes)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Image save error: {e}")
-    return {"image_url": image_url}
+    return ORJSONResponse({"image_url": image_url})
+
 
+@app.post("/image/raw", response_class=Response)
+async def generate_image_raw(req: ImageReq, request: Request):
+    """
+    Generate a single image and return the PNG bytes directly, without saving
+    it to media storage. Sends an ETag and honours If-None-Match.
+    """
+    prompt = _styled_image_prompt(req.image_prompt, req.image_style)
+    try:
+        img_bytes = await generate_image_core(prompt, size=req.size)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Image provider error: {e}")
+
+    if not isinstance(img_bytes, (bytes, bytearray)):
+        raise HTTPException(status_code=502, detail="Image provider returned no data.")
 
-@app.post("/story/{story_id}/tts", response_model=StoryResp)
+    etag = f'"{hashlib.blake2b(img_bytes, digest_size=16).hexdigest()}"'
+    # A POST response: shared caches don't key it on the body, and a refresh can
+    # map the same prompt to a new image, so keep it private and time-limited.
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=bytes(img_bytes), media_type="image/png", headers=headers)
+
+
+@app.post("/story/{story_id}/tts", responses={200: {"model": StoryResp}})
 async def generate_tts(story_id: str, req: TTSReq, request: Request):
     """
     Generate audio for each section and return updated story.
     """
-    use_supabase = (not USE_LOCAL_DB) and supabase_db.enabled()
+    use_supabase = USE_SUPABASE_BACKEND
     token: Optional[str] = _require_bearer_token(request) if use_supabase else None
     if use_supabase:
         d = await supabase_db.get_story(token=token or "", story_id=story_id)
@@ -925,20 +1427,14 @@ async def generate_tts(story_id: str, req: TTSReq, request: Request):
             raise HTTPException(status_code=404, detail="Story not found")
         d["status"] = "generating-audio"
     try:
-        for s in d["sections"]:
-            audio_bytes = await synthesize_tts(
-                s["text"], voice=req.voice, fmt=req.format
-            )
-            s["audio_url"] = save_audio_bytes(
-                story_id, s["id"], audio_bytes, ext=req.format
-            )
-            if use_supabase:
-                await supabase_db.update_section(
-                    token=token or "",
-                    story_id=story_id,
-                    idx=int(s["id"]),
-                    audio_url=s["audio_url"],
-                )
+        await _section_audios(
+            story_id,
+            d["sections"],
+            voice=req.voice,
+            fmt=req.format,
+            use_supabase=use_supabase,
+            token=token,
+        )
     except Exception as e:
         if not use_supabase:
             d["status"] = "ready"
@@ -946,12 +1442,7 @@ async def generate_tts(story_id: str, req: TTSReq, request: Request):
 
     if not use_supabase:
         d["status"] = "ready"
-    return {
-        "story_id": story_id,
-        "title": d["title"],
-        "sections": d["sections"],
-        "status": "ready",
-    }
+    return _story_response(story_id, d["title"], d["sections"], "ready")
 
 
 # Serve the web UI (mount last so it doesn't shadow API routes)
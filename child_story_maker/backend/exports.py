@@ -1,15 +1,36 @@
 from __future__ import annotations
 
+import asyncio
 import os
+import zipfile
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, List, Optional, Union
 from urllib.parse import urlparse
 
 import httpx
 
+from child_story_maker.backend.services.http import get_client
+from child_story_maker.common.cache import LRUCache
 from child_story_maker.common.models import Story, Chapter
 from child_story_maker.common.paths import repo_root
-from child_story_maker.common.utils import build_pdf, package_story_downloads
+from child_story_maker.common.utils import (
+    build_pdf,
+    chapter_image_name,
+    package_story_downloads,
+    story_manifest,
+)
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+# ZIP compression and PDF rendering run in worker threads; cap how many at once.
+EXPORT_CONCURRENCY = max(1, int(os.getenv("EXPORT_CONCURRENCY", str(os.cpu_count() or 4))))
+
+_EXPORT_SEM = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+# Remote images seen by recent exports, as url -> (etag, bytes). Media URLs are
+# reused when an image is regenerated, so entries are revalidated with
+# If-None-Match instead of being served blindly.
+EXPORT_IMG_CACHE_SIZE = int(os.getenv("EXPORT_IMG_CACHE_SIZE", "64"))
+_REMOTE_IMG_CACHE = LRUCache(EXPORT_IMG_CACHE_SIZE)
 
 
 def _resolve_media_path(image_url: str) -> Optional[Path]:
@@ -25,35 +46,91 @@ def _resolve_media_path(image_url: str) -> Optional[Path]:
     return None
 
 
+_sync_client: Optional[httpx.Client] = None
+
+
+def _get_sync_client() -> httpx.Client:
+    """Keep-alive client for the synchronous export path (export_zip/export_pdf)."""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+        )
+    return _sync_client
+
+
+def _conditional_headers(image_url: str) -> dict:
+    cached = _REMOTE_IMG_CACHE.get(image_url)
+    return {"If-None-Match": cached[0]} if cached else {}
+
+
+def _remote_image_result(image_url: str, resp: httpx.Response) -> bytes:
+    if resp.status_code == 304:
+        cached = _REMOTE_IMG_CACHE.get(image_url)
+        if cached:
+            return cached[1]
+    resp.raise_for_status()
+    etag = resp.headers.get("etag")
+    if etag:
+        _REMOTE_IMG_CACHE.set(image_url, (etag, resp.content))
+    return resp.content
+
+
 def _load_image_bytes(image_url: str) -> Optional[bytes]:
     path = _resolve_media_path(image_url)
     if path and path.exists():
         return path.read_bytes()
     if image_url and image_url.startswith("http"):
         try:
-            resp = httpx.get(image_url, timeout=30)
-            resp.raise_for_status()
-            return resp.content
+            resp = _get_sync_client().get(
+                image_url, headers=_conditional_headers(image_url)
+            )
+            return _remote_image_result(image_url, resp)
+        except Exception:
+            return None
+    return None
+
+
+async def _aload_image_bytes(image_url: str) -> Optional[bytes]:
+    """Async counterpart of _load_image_bytes for the streaming exports."""
+    path = _resolve_media_path(image_url)
+    if path and path.exists():
+        return await asyncio.to_thread(path.read_bytes)
+    if image_url and image_url.startswith("http"):
+        try:
+            resp = await get_client().get(
+                image_url, headers=_conditional_headers(image_url), timeout=30
+            )
+            return _remote_image_result(image_url, resp)
         except Exception:
             return None
     return None
 
 
 def story_from_db(
-    story_id: str, data: dict
+    story_id: str, data: dict, *, load_images: bool = True
 ) -> Story:
-    chapters = []
-    for sec in data.get("sections", []):
-        image_url = sec.get("image_url")
-        chapters.append(
-            Chapter(
-                title=sec.get("title") or f"Section {sec.get('id', len(chapters) + 1)}",
-                text=sec.get("text", ""),
-                image_prompt=sec.get("image_prompt"),
-                image_url=image_url,
-                image_bytes=_load_image_bytes(image_url or ""),
-            )
+    # Sections can point at the same image; read/fetch each URL once per export.
+    loaded: dict[str, Optional[bytes]] = {}
+
+    def _image(url: Optional[str]) -> Optional[bytes]:
+        if not load_images or not url:
+            return None
+        if url not in loaded:
+            loaded[url] = _load_image_bytes(url)
+        return loaded[url]
+
+    chapters = [
+        Chapter(
+            title=sec.get("title") or f"Section {sec.get('id', idx)}",
+            text=sec.get("text", ""),
+            image_prompt=sec.get("image_prompt"),
+            image_url=sec.get("image_url"),
+            image_bytes=_image(sec.get("image_url")),
         )
+        for idx, sec in enumerate(data.get("sections", []), start=1)
+    ]
     return Story(
         title=data.get("title", "Untitled Story"),
         author="openai",
@@ -65,6 +142,17 @@ def story_from_db(
     )
 
 
+async def astory_from_db(story_id: str, data: dict) -> Story:
+    """story_from_db with each distinct chapter image fetched concurrently."""
+    story = story_from_db(story_id, data, load_images=False)
+    urls = list(dict.fromkeys(ch.image_url for ch in story.chapters if ch.image_url))
+    images = await asyncio.gather(*(_aload_image_bytes(url) for url in urls))
+    by_url = dict(zip(urls, images))
+    for ch in story.chapters:
+        ch.image_bytes = by_url.get(ch.image_url) if ch.image_url else None
+    return story
+
+
 def export_zip(story_id: str, data: dict) -> bytes:
     story = story_from_db(story_id, data)
     return package_story_downloads(story)
@@ -73,3 +161,89 @@ def export_zip(story_id: str, data: dict) -> bytes:
 def export_pdf(story_id: str, data: dict) -> bytes:
     story = story_from_db(story_id, data)
     return build_pdf(story, cover_img_bytes=None)
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object; zipfile then emits data descriptors."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+async def _zip_image_source(image_url: str) -> Union[Path, bytes, None]:
+    """Local media as a path (zipfile then reads it in chunks), remote as bytes."""
+    path = _resolve_media_path(image_url)
+    if path and path.exists():
+        return path
+    return await _aload_image_bytes(image_url)
+
+
+def _zip_add_image(zf: zipfile.ZipFile, name: str, source: Union[Path, bytes]) -> None:
+    # PNG data is already deflated; recompressing it costs CPU for no gain.
+    if isinstance(source, Path):
+        zf.write(source, name, compress_type=zipfile.ZIP_STORED)
+    else:
+        zf.writestr(name, source, compress_type=zipfile.ZIP_STORED)
+
+
+async def export_zip_stream(story_id: str, data: dict) -> AsyncIterator[bytes]:
+    """
+    Yield the story ZIP entry by entry. Local media files are streamed into the
+    archive straight from disk; at most one remote image is held in memory at a
+    time, fetched while the previous entry is compressed in a worker thread.
+    """
+    story = story_from_db(story_id, data, load_images=False)
+    sink = _ChunkSink()
+    urls = [ch.image_url or "" for ch in story.chapters]
+    pending = asyncio.create_task(_zip_image_source(urls[0])) if urls else None
+    try:
+        with zipfile.ZipFile(
+            sink, mode="w", compression=zipfile.ZIP_DEFLATED, allowZip64=True
+        ) as zf:
+            async with _EXPORT_SEM:
+                await asyncio.to_thread(zf.writestr, "story.json", story_manifest(story))
+            yield sink.drain()
+            for idx in range(1, len(urls) + 1):
+                source = await pending
+                pending = (
+                    asyncio.create_task(_zip_image_source(urls[idx]))
+                    if idx < len(urls)
+                    else None
+                )
+                if source:
+                    async with _EXPORT_SEM:
+                        await asyncio.to_thread(
+                            _zip_add_image, zf, chapter_image_name(idx), source
+                        )
+                    del source
+                    yield sink.drain()
+        yield sink.drain()
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def export_pdf_stream(story_id: str, data: dict) -> AsyncIterator[bytes]:
+    """
+    Yield the story PDF in EXPORT_CHUNK_SIZE pieces. reportlab lays out the whole
+    document before writing the xref table, so the PDF itself is still rendered
+    in one go (in a worker thread); images are fetched concurrently first.
+    """
+    story = await astory_from_db(story_id, data)
+    async with _EXPORT_SEM:
+        pdf = memoryview(await asyncio.to_thread(build_pdf, story, None))
+    for start in range(0, len(pdf), EXPORT_CHUNK_SIZE):
+        yield bytes(pdf[start : start + EXPORT_CHUNK_SIZE])
@@ -0,0 +1,28 @@
+"""Process-wide httpx.AsyncClient shared by the Supabase, TTS and image helpers."""
+from __future__ import annotations
+
+from typing import Optional
+
+import httpx
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared keep-alive HTTP/2 client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        )
+    return _client
+
+
+async def aclose() -> None:
+    """Close the shared client; call on application shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,28 +1,61 @@
+import asyncio
 import os
-import httpx
+from typing import Dict
+
 from dotenv import load_dotenv
 
+from child_story_maker.backend.services.http import get_client
+from child_story_maker.common.cache import LRUCache, cache_key
 from child_story_maker.common.paths import repo_root
 
 load_dotenv(dotenv_path=repo_root() / ".env")
 OPENAI_BASE = "https://api.openai.com/v1"
 TTS_MODEL = os.getenv("TTS_MODEL", "gpt-4o-mini-tts").strip() or "gpt-4o-mini-tts"
+# Max concurrent speech requests per process, so a long story can't trip rate limits.
+TTS_CONCURRENCY = max(1, int(os.getenv("TTS_CONCURRENCY", "4")))
+# Recently synthesized clips keyed by (model, voice, format, text); 0 disables.
+TTS_CACHE_SIZE = int(os.getenv("TTS_CACHE_SIZE", "256"))
+
+_TTS_SEM = asyncio.Semaphore(TTS_CONCURRENCY)
+_AUDIO_CACHE = LRUCache(TTS_CACHE_SIZE)
+# key -> in-flight request, so identical concurrent sections share one API call
+_INFLIGHT: Dict[str, "asyncio.Future[bytes]"] = {}
+
+
+async def _request_speech(key: str, text: str, voice: str, fmt: str) -> bytes:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY missing. Put it in .env")
+    headers = {"Authorization": f"Bearer {api_key}"}
+    body = {"model": TTS_MODEL, "voice": voice, "input": text, "format": fmt}
+    client = get_client()
+    async with _TTS_SEM:
+        r = await client.post(
+            f"{OPENAI_BASE}/audio/speech", json=body, headers=headers, timeout=120
+        )
+    r.raise_for_status()
+    _AUDIO_CACHE.set(key, r.content)
+    return r.content  # binary audio
+
 
 async def synthesize_tts(text: str, *, voice: str = "verse", fmt: str = "mp3") -> bytes:
     """
     Convert text -> speech using OpenAI TTS (gpt-4o-mini-tts).
-    Returns raw audio bytes (MP3 by default).
+    Returns raw audio bytes (MP3 by default). Repeated text is served from an
+    in-process LRU, and concurrent identical requests are coalesced.
     """
     # gentle pacing for kids: add a period if missing and normalize whitespace
     t = " ".join(text.strip().split())
     if not t.endswith((".", "!", "?")):
         t += "."
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY missing. Put it in .env")
-    headers = {"Authorization": f"Bearer {api_key}"}
-    body = {"model": TTS_MODEL, "voice": voice, "input": t, "format": fmt}
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.post(f"{OPENAI_BASE}/audio/speech", json=body, headers=headers)
-        r.raise_for_status()
-        return r.content  # binary audio
+    key = cache_key(TTS_MODEL, voice, fmt, t)
+    cached = _AUDIO_CACHE.get(key)
+    if cached is not None:
+        return cached
+    pending = _INFLIGHT.get(key)
+    if pending is None:
+        pending = asyncio.ensure_future(_request_speech(key, t, voice, fmt))
+        _INFLIGHT[key] = pending
+        pending.add_done_callback(lambda _: _INFLIGHT.pop(key, None))
+    # shield: one caller being cancelled must not cancel the shared request
+    return await asyncio.shield(pending)
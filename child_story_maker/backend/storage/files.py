@@ -1,7 +1,10 @@
+import asyncio
+import io
 import os
 
 import httpx
 
+from child_story_maker.backend.services.http import get_client
 from child_story_maker.common.paths import repo_root
 
 MEDIA_DIR = str(repo_root() / "media")
@@ -13,35 +16,89 @@ USE_SUPABASE_STORAGE = bool(
     SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY and SUPABASE_STORAGE_BUCKET
 )
 DISABLE_LOCAL_MEDIA = os.getenv("DISABLE_LOCAL_MEDIA", "") == "1"
+# Re-encode generated PNGs as optimized palette images before storing them.
+STORY_IMG_COMPRESS = os.getenv("STORY_IMG_COMPRESS", "") == "1"
+STORY_IMG_COLORS = int(os.getenv("STORY_IMG_COLORS", "128"))
 
 
-def _supabase_upload(path: str, data: bytes, content_type: str) -> str:
-    url = f"{SUPABASE_URL}/storage/v1/object/{SUPABASE_STORAGE_BUCKET}/{path}"
-    headers = {
+def _upload_headers(content_type: str) -> dict:
+    return {
         "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
         "apikey": SUPABASE_SERVICE_ROLE_KEY,
         "Content-Type": content_type,
         "x-upsert": "true",
     }
-    with httpx.Client(timeout=60) as client:
-        resp = client.post(url, headers=headers, content=data)
+
+
+def _upload_result(resp: httpx.Response, path: str) -> str:
     if resp.status_code not in (200, 201):
         raise RuntimeError(f"Supabase upload failed: {resp.status_code} {resp.text}")
     return f"{SUPABASE_URL}/storage/v1/object/public/{SUPABASE_STORAGE_BUCKET}/{path}"
 
 
+def _supabase_upload(path: str, data: bytes, content_type: str) -> str:
+    url = f"{SUPABASE_URL}/storage/v1/object/{SUPABASE_STORAGE_BUCKET}/{path}"
+    with httpx.Client(timeout=60) as client:
+        resp = client.post(url, headers=_upload_headers(content_type), content=data)
+    return _upload_result(resp, path)
+
+
+async def _supabase_upload_async(path: str, data: bytes, content_type: str) -> str:
+    url = f"{SUPABASE_URL}/storage/v1/object/{SUPABASE_STORAGE_BUCKET}/{path}"
+    resp = await get_client().post(
+        url, headers=_upload_headers(content_type), content=data, timeout=60
+    )
+    return _upload_result(resp, path)
+
+
+# Story folders already created by this process; skips the makedirs syscall on
+# every section write. Media folders are never removed while the app runs.
+_MADE_DIRS: set[str] = set()
+
+
+def _story_folder(story_id: str) -> str:
+    folder = os.path.join(MEDIA_DIR, story_id)
+    if folder not in _MADE_DIRS:
+        os.makedirs(folder, exist_ok=True)
+        _MADE_DIRS.add(folder)
+    return folder
+
+
 def ensure_media_dir() -> None:
     if USE_SUPABASE_STORAGE or DISABLE_LOCAL_MEDIA:
         return
     os.makedirs(MEDIA_DIR, exist_ok=True)
 
 
+def _compress_png(data: bytes) -> bytes:
+    """
+    Quantize to a STORY_IMG_COLORS palette and save with optimize=True when
+    STORY_IMG_COMPRESS=1. Returns the original bytes if Pillow is missing, the
+    image can't be decoded, or the result isn't smaller.
+    """
+    if not STORY_IMG_COMPRESS:
+        return data
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert("RGB").quantize(colors=STORY_IMG_COLORS)
+            buf = io.BytesIO()
+            img.save(buf, "PNG", optimize=True)
+    except Exception:
+        return data
+    out = buf.getvalue()
+    return out if len(out) < len(data) else data
+
+
 def save_image_bytes(story_id: str, section_id: int, data: bytes) -> str:
+    data = _compress_png(data)
     if USE_SUPABASE_STORAGE:
         path = f"{story_id}/sec_{section_id}.png"
         return _supabase_upload(path, data, "image/png")
-    folder = os.path.join(MEDIA_DIR, story_id)
-    os.makedirs(folder, exist_ok=True)
+    folder = _story_folder(story_id)
     path = os.path.join(folder, f"sec_{section_id}.png")
     with open(path, "wb") as f:
         f.write(data)
@@ -52,9 +109,30 @@ def save_audio_bytes(story_id: str, section_id: int, data: bytes, ext: str = "mp
     if USE_SUPABASE_STORAGE:
         path = f"{story_id}/sec_{section_id}.{ext}"
         return _supabase_upload(path, data, f"audio/{ext}")
-    folder = os.path.join(MEDIA_DIR, story_id)
-    os.makedirs(folder, exist_ok=True)
+    folder = _story_folder(story_id)
     path = os.path.join(folder, f"sec_{section_id}.{ext}")
     with open(path, "wb") as f:
         f.write(data)
     return f"/media/{story_id}/sec_{section_id}.{ext}"
+
+
+async def save_image_bytes_async(story_id: str, section_id: int, data: bytes) -> str:
+    """
+    Async save_image_bytes: Supabase uploads go through the shared keep-alive
+    client, local writes run in a worker thread.
+    """
+    if USE_SUPABASE_STORAGE:
+        path = f"{story_id}/sec_{section_id}.png"
+        if STORY_IMG_COMPRESS:
+            data = await asyncio.to_thread(_compress_png, data)
+        return await _supabase_upload_async(path, data, "image/png")
+    return await asyncio.to_thread(save_image_bytes, story_id, section_id, data)
+
+
+async def save_audio_bytes_async(
+    story_id: str, section_id: int, data: bytes, ext: str = "mp3"
+) -> str:
+    if USE_SUPABASE_STORAGE:
+        path = f"{story_id}/sec_{section_id}.{ext}"
+        return await _supabase_upload_async(path, data, f"audio/{ext}")
+    return await asyncio.to_thread(save_audio_bytes, story_id, section_id, data, ext)
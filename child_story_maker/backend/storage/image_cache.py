@@ -0,0 +1,86 @@
+"""Content-addressed on-disk cache of generated images."""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+IMG_CACHE_DIR = Path(
+    os.getenv("IMG_CACHE_DIR", os.path.join(tempfile.gettempdir(), "csm_img_cache"))
+)
+IMG_CACHE_MAX_BYTES = int(os.getenv("IMG_CACHE_MAX_MB", "512")) * 1024 * 1024
+STORY_IMG_CACHE_DISABLE = os.getenv("STORY_IMG_CACHE_DISABLE", "") == "1"
+
+
+def image_key(model: str, size: str, prompt: str) -> str:
+    raw = f"{model}|{size}|{prompt}".encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _path(key: str) -> Path:
+    return IMG_CACHE_DIR / f"{key}.png"
+
+
+def get(key: str) -> Optional[bytes]:
+    if STORY_IMG_CACHE_DISABLE:
+        return None
+    path = _path(key)
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    try:
+        # Refresh atime explicitly; many mounts use noatime/relatime.
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+
+def put(key: str, data: bytes) -> None:
+    """Write atomically (temp file + rename) and evict if over budget. Never raises."""
+    if STORY_IMG_CACHE_DISABLE:
+        return
+    try:
+        IMG_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=IMG_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, _path(key))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        _evict()
+    except OSError:
+        pass
+
+
+def _evict() -> None:
+    entries = []
+    total = 0
+    with os.scandir(IMG_CACHE_DIR) as it:
+        for entry in it:
+            if not entry.name.endswith(".png"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_atime, st.st_size, entry.path))
+            total += st.st_size
+    if total <= IMG_CACHE_MAX_BYTES:
+        return
+    # Drop least recently used files until back under 90% of the budget.
+    target = IMG_CACHE_MAX_BYTES * 0.9
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
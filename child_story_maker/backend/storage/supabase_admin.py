@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+import asyncio
 import os
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
-import httpx
+from child_story_maker.backend.services.http import get_client
+from child_story_maker.backend.storage.supabase_db import SECTION_COLUMNS
+from child_story_maker.common.cache import LRUCache
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "").rstrip("/")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+# Seconds a resolved share link is served from memory; 0 disables. Deleting a
+# story evicts its links in this process only; other workers may keep serving
+# them for up to this long.
+SHARE_CACHE_TTL = float(os.getenv("SHARE_CACHE_TTL", "30"))
+
+# token -> (monotonic deadline, story)
+_SHARE_CACHE = LRUCache(1024)
+_SHARE_INFLIGHT: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
 
 
 def enabled() -> bool:
@@ -39,55 +51,75 @@ def _parse_ts(value: Optional[str]) -> Optional[datetime]:
 
 
 async def get_story_by_share_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Shared story for a share token, or None if unknown/expired. Results are
+    cached for SHARE_CACHE_TTL seconds (never past the share's expiry) and
+    concurrent first reads of a token share one fetch. Treat the result as
+    read-only; it may be handed to other callers.
+    """
     if not enabled():
         raise RuntimeError("Supabase admin access is not configured.")
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            _rest_url("story_shares"),
-            headers=_headers_admin(),
-            params={
-                "token": f"eq.{token}",
-                "select": "story_id,expires_at",
-            },
-        )
-        resp.raise_for_status()
-        shares = resp.json() or []
-        if not shares:
-            return None
-        share = shares[0]
-        expires_at = _parse_ts(share.get("expires_at"))
-        if expires_at and expires_at < datetime.now(timezone.utc):
-            return None
-        story_id = share.get("story_id")
-        if not story_id:
-            return None
-
-        resp2 = await client.get(
-            _rest_url("stories"),
-            headers=_headers_admin(),
-            params={
-                "id": f"eq.{story_id}",
-                "select": "id,title,age_group,language,style",
-            },
-        )
-        resp2.raise_for_status()
-        stories = resp2.json() or []
-        if not stories:
-            return None
-        story_row = stories[0]
-
-        resp3 = await client.get(
-            _rest_url("story_sections"),
-            headers=_headers_admin(),
-            params={
-                "story_id": f"eq.{story_id}",
-                "select": "idx,title,text,image_prompt,image_url,audio_url",
-                "order": "idx.asc",
-            },
-        )
-        resp3.raise_for_status()
-        sections = resp3.json() or []
+    cached = _SHARE_CACHE.get(token)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    pending = _SHARE_INFLIGHT.get(token)
+    if pending is None:
+        pending = asyncio.ensure_future(_load_share(token))
+        _SHARE_INFLIGHT[token] = pending
+        pending.add_done_callback(lambda _: _SHARE_INFLIGHT.pop(token, None))
+    return await asyncio.shield(pending)
+
+
+def forget_story(story_id: str) -> None:
+    """Drop cached share lookups that resolve to story_id (e.g. after a delete)."""
+    for token, (_, data) in _SHARE_CACHE.items():
+        if data.get("story_id") == str(story_id):
+            _SHARE_CACHE.pop(token)
+
+
+async def _load_share(token: str) -> Optional[Dict[str, Any]]:
+    data, expires_at = await _fetch_story_by_share_token(token)
+    if data is not None and SHARE_CACHE_TTL > 0:
+        ttl = SHARE_CACHE_TTL
+        if expires_at is not None:
+            ttl = min(ttl, (expires_at - datetime.now(timezone.utc)).total_seconds())
+        if ttl > 0:
+            _SHARE_CACHE.set(token, (time.monotonic() + ttl, data))
+    return data
+
+
+async def _fetch_story_by_share_token(
+    token: str,
+) -> Tuple[Optional[Dict[str, Any]], Optional[datetime]]:
+    client = get_client()
+    # Share, story and sections in one round trip through the foreign keys
+    # story_shares.story_id -> stories.id <- story_sections.story_id.
+    resp = await client.get(
+        _rest_url("story_shares"),
+        headers=_headers_admin(),
+        params={
+            "token": f"eq.{token}",
+            "select": (
+                "story_id,expires_at,"
+                f"stories(id,title,age_group,language,style,story_sections({SECTION_COLUMNS}))"
+            ),
+            "stories.story_sections.order": "idx.asc",
+        },
+    )
+    resp.raise_for_status()
+    shares = resp.json() or []
+    if not shares:
+        return None, None
+    share = shares[0]
+    expires_at = _parse_ts(share.get("expires_at"))
+    if expires_at and expires_at < datetime.now(timezone.utc):
+        return None, None
+    story_id = share.get("story_id")
+    story_row = share.get("stories")
+    if not story_id or not story_row:
+        return None, None
+    sections = story_row.get("story_sections") or []
 
     norm_sections = []
     for sec in sections:
@@ -110,4 +142,4 @@ async def get_story_by_share_token(token: str) -> Optional[Dict[str, Any]]:
         "age_group": story_row.get("age_group") or "",
         "language": story_row.get("language") or "",
         "style": story_row.get("style") or "",
-    }
+    }, expires_at
@@ -1,13 +1,31 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import httpx
+import orjson
+
+from child_story_maker.backend.services.http import get_client
+from child_story_maker.common.cache import LRUCache
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "").rstrip("/")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 
+SECTION_COLUMNS = "idx,title,text,image_prompt,image_url,audio_url"
+
+# Short-lived read caches, always keyed on the caller's token. Values are kept
+# as orjson bytes so callers can mutate what they get back. Writes made through
+# this module drop the story's entries; other workers see them after the TTL.
+SUPABASE_CACHE_TTL = float(os.getenv("SUPABASE_CACHE_TTL", "30"))
+SUPABASE_LIST_CACHE_TTL = float(os.getenv("SUPABASE_LIST_CACHE_TTL", "5"))
+
+# story_id -> {(kind, token, *args): (monotonic deadline, orjson bytes)}
+_READS = LRUCache(1024)
+# (token, child_id) -> (monotonic deadline, orjson bytes)
+_LISTS = LRUCache(256)
+
 
 def enabled() -> bool:
     return bool(SUPABASE_URL and SUPABASE_ANON_KEY)
@@ -25,6 +43,100 @@ def _rest_url(path: str) -> str:
     return f"{SUPABASE_URL}/rest/v1/{path.lstrip('/')}"
 
 
+def _json(resp: httpx.Response) -> Any:
+    """Decode a PostgREST response body with orjson; None when it is empty."""
+    return orjson.loads(resp.content) if resp.content else None
+
+
+def _upsert_prefer(return_representation: bool) -> str:
+    ret = "representation" if return_representation else "minimal"
+    return f"resolution=merge-duplicates,return={ret}"
+
+
+def _read_cached(story_id: str, key: Tuple[Any, ...]) -> Tuple[bool, Any]:
+    entries = _READS.get(story_id)
+    hit = entries.get(key) if entries else None
+    if hit is None or hit[0] <= time.monotonic():
+        return False, None
+    return True, orjson.loads(hit[1])
+
+
+def _store_read(story_id: str, key: Tuple[Any, ...], value: Any) -> None:
+    if value is None or SUPABASE_CACHE_TTL <= 0:
+        return
+    entries = _READS.get(story_id)
+    if entries is None:
+        entries = {}
+        _READS.set(story_id, entries)
+    entries[key] = (time.monotonic() + SUPABASE_CACHE_TTL, orjson.dumps(value))
+
+
+def _invalidate(story_id: Optional[str] = None, *, lists: bool = False) -> None:
+    if story_id is not None:
+        _READS.pop(story_id)
+    if lists:
+        _LISTS.clear()
+
+
+# create_story inserts the story and its sections in one transactional RPC
+# (create_story_with_sections in supabase/schema.sql). SUPABASE_STORY_RPC=0
+# uses the two-request path instead; so does a database without the function.
+SUPABASE_STORY_RPC = os.getenv("SUPABASE_STORY_RPC", "1") == "1"
+_story_rpc_missing = False
+
+
+def _use_story_rpc() -> bool:
+    return SUPABASE_STORY_RPC and not _story_rpc_missing
+
+
+async def _create_story_rpc(
+    client: httpx.AsyncClient,
+    token: str,
+    story_payload: Dict[str, Any],
+    section_rows: List[Dict[str, Any]],
+) -> Optional[str]:
+    """New story id, or None when the database has no create_story_with_sections."""
+    global _story_rpc_missing
+    resp = await client.post(
+        _rest_url("rpc/create_story_with_sections"),
+        headers=_headers(token),
+        content=orjson.dumps({"p_story": story_payload, "p_sections": section_rows}),
+        timeout=60,
+    )
+    if resp.status_code == 404:
+        _story_rpc_missing = True
+        return None
+    resp.raise_for_status()
+    return str(_json(resp))
+
+
+async def _create_story_rows(
+    client: httpx.AsyncClient,
+    token: str,
+    story_payload: Dict[str, Any],
+    section_rows: List[Dict[str, Any]],
+) -> str:
+    resp = await client.post(
+        _rest_url("stories"),
+        headers={**_headers(token), "Prefer": "return=representation"},
+        content=orjson.dumps(story_payload),
+        timeout=60,
+    )
+    resp.raise_for_status()
+    data = _json(resp)
+    row = data[0] if isinstance(data, list) else data
+    story_id = str(row["id"])
+    if section_rows:
+        resp2 = await client.post(
+            _rest_url("story_sections"),
+            headers={**_headers(token), "Prefer": "return=minimal"},
+            content=orjson.dumps([{**r, "story_id": story_id} for r in section_rows]),
+            timeout=60,
+        )
+        resp2.raise_for_status()
+    return story_id
+
+
 async def create_story(
     *,
     token: str,
@@ -59,71 +171,52 @@ async def create_story(
     if child_id:
         story_payload["child_id"] = child_id
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        resp = await client.post(
-            _rest_url("stories"),
-            headers={**_headers(token), "Prefer": "return=representation"},
-            json=story_payload,
+    section_rows = []
+    for sec in sections:
+        section_rows.append(
+            {
+                "idx": int(sec["id"]),
+                "title": sec.get("title") or f"Section {sec['id']}",
+                "text": sec["text"],
+                "image_prompt": sec["image_prompt"],
+                "image_url": sec.get("image_url"),
+                "audio_url": sec.get("audio_url"),
+            }
         )
-        resp.raise_for_status()
-        data = resp.json()
-        row = data[0] if isinstance(data, list) else data
-        story_id = row["id"]
-
-        section_rows = []
-        for sec in sections:
-            section_rows.append(
-                {
-                    "story_id": story_id,
-                    "idx": int(sec["id"]),
-                    "title": sec.get("title") or f"Section {sec['id']}",
-                    "text": sec["text"],
-                    "image_prompt": sec["image_prompt"],
-                    "image_url": sec.get("image_url"),
-                    "audio_url": sec.get("audio_url"),
-                }
-            )
-        if section_rows:
-            resp2 = await client.post(
-                _rest_url("story_sections"),
-                headers={**_headers(token), "Prefer": "return=minimal"},
-                json=section_rows,
-            )
-            resp2.raise_for_status()
 
+    client = get_client()
+    story_id: Optional[str] = None
+    if _use_story_rpc():
+        story_id = await _create_story_rpc(client, token, story_payload, section_rows)
+    if story_id is None:
+        story_id = await _create_story_rows(client, token, story_payload, section_rows)
+
+    _invalidate(lists=True)
     return str(story_id)
 
 
-async def get_story(*, token: str, story_id: str) -> Optional[Dict[str, Any]]:
+async def _fetch_story(*, token: str, story_id: str) -> Optional[Dict[str, Any]]:
     if not enabled():
         raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            _rest_url("stories"),
-            headers=_headers(token),
-            params={
-                "id": f"eq.{story_id}",
-                "select": "id,title,age_group,language,style",
-            },
-        )
-        resp.raise_for_status()
-        stories = resp.json() or []
-        if not stories:
-            return None
-        story_row = stories[0]
-
-        resp2 = await client.get(
-            _rest_url("story_sections"),
-            headers=_headers(token),
-            params={
-                "story_id": f"eq.{story_id}",
-                "select": "idx,title,text,image_prompt,image_url,audio_url",
-                "order": "idx.asc",
-            },
-        )
-        resp2.raise_for_status()
-        sections = resp2.json() or []
+    # One round trip: the sections come back embedded in the story row,
+    # via the story_sections.story_id foreign key.
+    client = get_client()
+    resp = await client.get(
+        _rest_url("stories"),
+        headers=_headers(token),
+        params={
+            "id": f"eq.{story_id}",
+            "select": f"id,title,age_group,language,style,story_sections({SECTION_COLUMNS})",
+            "story_sections.order": "idx.asc",
+        },
+    )
+    resp.raise_for_status()
+    stories = _json(resp) or []
+    if not stories:
+        return None
+    story_row = stories[0]
+    sections = story_row.get("story_sections") or []
 
     norm_sections = []
     for sec in sections:
@@ -148,6 +241,17 @@ async def get_story(*, token: str, story_id: str) -> Optional[Dict[str, Any]]:
     }
 
 
+async def get_story(*, token: str, story_id: str) -> Optional[Dict[str, Any]]:
+    """_fetch_story behind the per-token read cache (SUPABASE_CACHE_TTL)."""
+    key = ("story", token)
+    hit, value = _read_cached(story_id, key)
+    if hit:
+        return value
+    value = await _fetch_story(token=token, story_id=story_id)
+    _store_read(story_id, key, value)
+    return value
+
+
 async def list_stories(
     *, token: str, child_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
@@ -159,26 +263,34 @@ async def list_stories(
     }
     if child_id:
         params["child_id"] = f"eq.{child_id}"
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            _rest_url("stories"),
-            headers=_headers(token),
-            params=params,
-        )
-        resp.raise_for_status()
-        return resp.json() or []
+    key = (token, child_id)
+    hit = _LISTS.get(key)
+    if hit is not None and hit[0] > time.monotonic():
+        return orjson.loads(hit[1])
+    client = get_client()
+    resp = await client.get(
+        _rest_url("stories"),
+        headers=_headers(token),
+        params=params,
+    )
+    resp.raise_for_status()
+    rows = _json(resp) or []
+    if SUPABASE_LIST_CACHE_TTL > 0:
+        _LISTS.set(key, (time.monotonic() + SUPABASE_LIST_CACHE_TTL, orjson.dumps(rows)))
+    return rows
 
 
 async def delete_story(*, token: str, story_id: str) -> None:
     if not enabled():
         raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.delete(
-            _rest_url("stories"),
-            headers=_headers(token),
-            params={"id": f"eq.{story_id}"},
-        )
-        resp.raise_for_status()
+    client = get_client()
+    resp = await client.delete(
+        _rest_url("stories"),
+        headers=_headers(token),
+        params={"id": f"eq.{story_id}"},
+    )
+    resp.raise_for_status()
+    _invalidate(story_id, lists=True)
 
 
 async def create_share(
@@ -189,79 +301,116 @@ async def create_share(
     payload: Dict[str, Any] = {"story_id": story_id}
     if expires_at:
         payload["expires_at"] = expires_at
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            _rest_url("story_shares"),
-            headers={**_headers(token), "Prefer": "return=representation"},
-            json=payload,
-        )
-        resp.raise_for_status()
-        rows = resp.json() or []
-        row = rows[0] if rows else {}
-        return str(row.get("token", ""))
+    client = get_client()
+    # Only the generated token is needed back, as a single object.
+    resp = await client.post(
+        _rest_url("story_shares"),
+        headers={
+            **_headers(token),
+            "Prefer": "return=representation",
+            "Accept": "application/vnd.pgrst.object+json",
+        },
+        params={"select": "token"},
+        content=orjson.dumps(payload),
+    )
+    resp.raise_for_status()
+    row = _json(resp) or {}
+    if isinstance(row, list):
+        row = row[0] if row else {}
+    return str(row.get("token", ""))
+
+
+async def _fetch_story_report(*, token: str, story_id: str) -> Optional[Dict[str, Any]]:
+    if not enabled():
+        raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
+    client = get_client()
+    resp = await client.get(
+        _rest_url("story_reports"),
+        headers=_headers(token),
+        params={"story_id": f"eq.{story_id}", "select": "report"},
+    )
+    resp.raise_for_status()
+    rows = _json(resp) or []
+    if not rows:
+        return None
+    return rows[0].get("report")
 
 
 async def get_story_report(*, token: str, story_id: str) -> Optional[Dict[str, Any]]:
-    if not enabled():
-        raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            _rest_url("story_reports"),
-            headers=_headers(token),
-            params={"story_id": f"eq.{story_id}", "select": "report"},
-        )
-        resp.raise_for_status()
-        rows = resp.json() or []
-        if not rows:
-            return None
-        return rows[0].get("report")
+    key = ("report", token)
+    hit, value = _read_cached(story_id, key)
+    if hit:
+        return value
+    value = await _fetch_story_report(token=token, story_id=story_id)
+    _store_read(story_id, key, value)
+    return value
 
 
 async def upsert_story_report(
-    *, token: str, story_id: str, report: Dict[str, Any]
+    *,
+    token: str,
+    story_id: str,
+    report: Dict[str, Any],
+    return_representation: bool = False,
 ) -> Dict[str, Any]:
+    """Store the report; the stored row is only read back when asked for."""
     if not enabled():
         raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
     payload = {"story_id": story_id, "report": report}
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            _rest_url("story_reports"),
-            headers={
-                **_headers(token),
-                "Prefer": "resolution=merge-duplicates,return=representation",
-            },
-            params={"on_conflict": "story_id"},
-            json=payload,
-        )
-        resp.raise_for_status()
-        rows = resp.json() or []
-        row = rows[0] if rows else {}
-        return row.get("report") or report
+    client = get_client()
+    resp = await client.post(
+        _rest_url("story_reports"),
+        headers={
+            **_headers(token),
+            "Prefer": _upsert_prefer(return_representation),
+        },
+        params={"on_conflict": "story_id"},
+        content=orjson.dumps(payload),
+    )
+    resp.raise_for_status()
+    _invalidate(story_id)
+    if not return_representation:
+        return report
+    rows = _json(resp) or []
+    row = rows[0] if rows else {}
+    return row.get("report") or report
+
+
+async def _fetch_story_learning(
+    *, token: str, story_id: str
+) -> Optional[Dict[str, Any]]:
+    if not enabled():
+        raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
+    client = get_client()
+    resp = await client.get(
+        _rest_url("story_learning"),
+        headers=_headers(token),
+        params={
+            "story_id": f"eq.{story_id}",
+            "select": "summary,questions,vocabulary",
+        },
+    )
+    resp.raise_for_status()
+    rows = _json(resp) or []
+    if not rows:
+        return None
+    return {
+        "summary": rows[0].get("summary"),
+        "questions": rows[0].get("questions"),
+        "vocabulary": rows[0].get("vocabulary"),
+    }
 
 
 async def get_story_learning(
     *, token: str, story_id: str
 ) -> Optional[Dict[str, Any]]:
-    if not enabled():
-        raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            _rest_url("story_learning"),
-            headers=_headers(token),
-            params={
-                "story_id": f"eq.{story_id}",
-                "select": "summary,questions,vocabulary",
-            },
-        )
-        resp.raise_for_status()
-        rows = resp.json() or []
-        if not rows:
-            return None
-        return {
-            "summary": rows[0].get("summary"),
-            "questions": rows[0].get("questions"),
-            "vocabulary": rows[0].get("vocabulary"),
-        }
+    key = ("learning", token)
+    hit, value = _read_cached(story_id, key)
+    if hit:
+        return value
+    value = await _fetch_story_learning(token=token, story_id=story_id)
+    _store_read(story_id, key, value)
+    return value
 
 
 async def upsert_story_learning(
@@ -271,7 +420,9 @@ async def upsert_story_learning(
     summary: str,
     questions: Any,
     vocabulary: Any,
+    return_representation: bool = False,
 ) -> Dict[str, Any]:
+    """Store the learning pack; the stored row is only read back when asked for."""
     if not enabled():
         raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
     payload = {
@@ -280,24 +431,27 @@ async def upsert_story_learning(
         "questions": questions,
         "vocabulary": vocabulary,
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            _rest_url("story_learning"),
-            headers={
-                **_headers(token),
-                "Prefer": "resolution=merge-duplicates,return=representation",
-            },
-            params={"on_conflict": "story_id"},
-            json=payload,
-        )
-        resp.raise_for_status()
-        rows = resp.json() or []
-        row = rows[0] if rows else {}
-        return {
-            "summary": row.get("summary") or summary,
-            "questions": row.get("questions") or questions,
-            "vocabulary": row.get("vocabulary") or vocabulary,
-        }
+    client = get_client()
+    resp = await client.post(
+        _rest_url("story_learning"),
+        headers={
+            **_headers(token),
+            "Prefer": _upsert_prefer(return_representation),
+        },
+        params={"on_conflict": "story_id"},
+        content=orjson.dumps(payload),
+    )
+    resp.raise_for_status()
+    _invalidate(story_id)
+    if not return_representation:
+        return {"summary": summary, "questions": questions, "vocabulary": vocabulary}
+    rows = _json(resp) or []
+    row = rows[0] if rows else {}
+    return {
+        "summary": row.get("summary") or summary,
+        "questions": row.get("questions") or questions,
+        "vocabulary": row.get("vocabulary") or vocabulary,
+    }
 
 
 async def update_section(
@@ -318,35 +472,79 @@ async def update_section(
     if not patch:
         return
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.patch(
-            _rest_url("story_sections"),
-            headers={**_headers(token), "Prefer": "return=minimal"},
-            params={"story_id": f"eq.{story_id}", "idx": f"eq.{idx}"},
-            json=patch,
-        )
-        resp.raise_for_status()
+    client = get_client()
+    resp = await client.patch(
+        _rest_url("story_sections"),
+        headers={**_headers(token), "Prefer": "return=minimal"},
+        params={"story_id": f"eq.{story_id}", "idx": f"eq.{idx}"},
+        content=orjson.dumps(patch),
+    )
+    resp.raise_for_status()
+    _invalidate(story_id)
 
 
-async def get_section(*, token: str, story_id: str, idx: int) -> Optional[Dict[str, Any]]:
+async def update_sections_bulk(
+    *,
+    token: str,
+    story_id: str,
+    sections: List[Dict[str, Any]],
+    columns: Sequence[str],
+) -> None:
+    """
+    Write `columns` for many sections in one upsert on (story_id, idx).
+    Postgres checks NOT NULL before resolving the conflict, so every row also
+    carries its current title/text/image_prompt.
+    """
     if not enabled():
         raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
+    rows = []
+    for sec in sections:
+        row: Dict[str, Any] = {
+            "story_id": story_id,
+            "idx": int(sec["id"]),
+            "title": sec.get("title") or f"Section {sec['id']}",
+            "text": sec.get("text") or "",
+            "image_prompt": sec.get("image_prompt") or "",
+        }
+        for col in columns:
+            row[col] = sec.get(col)
+        rows.append(row)
+    if not rows:
+        return
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            _rest_url("story_sections"),
-            headers=_headers(token),
-            params={
-                "story_id": f"eq.{story_id}",
-                "idx": f"eq.{idx}",
-                "select": "idx,title,text,image_prompt,image_url,audio_url",
-            },
-        )
-        resp.raise_for_status()
-        rows = resp.json() or []
-        if not rows:
-            return None
-        row = rows[0]
+    client = get_client()
+    resp = await client.post(
+        _rest_url("story_sections"),
+        headers={
+            **_headers(token),
+            "Prefer": "resolution=merge-duplicates,return=minimal",
+        },
+        params={"on_conflict": "story_id,idx"},
+        content=orjson.dumps(rows),
+    )
+    resp.raise_for_status()
+    _invalidate(story_id)
+
+
+async def _fetch_section(*, token: str, story_id: str, idx: int) -> Optional[Dict[str, Any]]:
+    if not enabled():
+        raise RuntimeError("Supabase is not configured (SUPABASE_URL/SUPABASE_ANON_KEY).")
+
+    client = get_client()
+    resp = await client.get(
+        _rest_url("story_sections"),
+        headers=_headers(token),
+        params={
+            "story_id": f"eq.{story_id}",
+            "idx": f"eq.{idx}",
+            "select": SECTION_COLUMNS,
+        },
+    )
+    resp.raise_for_status()
+    rows = _json(resp) or []
+    if not rows:
+        return None
+    row = rows[0]
     return {
         "id": int(row["idx"]),
         "title": row.get("title") or f"Section {row['idx']}",
@@ -355,3 +553,13 @@ async def get_section(*, token: str, story_id: str, idx: int) -> Optional[Dict[s
         "image_url": row.get("image_url"),
         "audio_url": row.get("audio_url"),
     }
+
+
+async def get_section(*, token: str, story_id: str, idx: int) -> Optional[Dict[str, Any]]:
+    key = ("section", token, int(idx))
+    hit, value = _read_cached(story_id, key)
+    if hit:
+        return value
+    value = await _fetch_section(token=token, story_id=story_id, idx=idx)
+    _store_read(story_id, key, value)
+    return value
@@ -5,26 +5,77 @@ import hashlib
 import hmac
 import os
 
+from child_story_maker.common.cache import LRUCache
+
+# New hashes use scrypt (memory-hard); PBKDF2 is still accepted for hashes
+# created before the switch and upgraded on the next successful login.
+SCRYPT_N = 2**14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+
 HASH_NAME = "sha256"
 ITERATIONS = 120_000
 
+# Recently verified (stored hash, password) pairs, keyed by a MAC under a
+# per-process secret so the cache never holds passwords or fast hashes of them
+# that outlive the process. Only successes are cached: a wrong guess always
+# pays the full key-derivation cost.
+VERIFY_CACHE_SIZE = int(os.getenv("AUTH_VERIFY_CACHE_SIZE", "1024"))
+_VERIFY_SECRET = os.urandom(32)
+_VERIFIED = LRUCache(VERIFY_CACHE_SIZE)
+
+
+def _verify_key(password: str, stored: str) -> bytes:
+    mac = hashlib.blake2b(key=_VERIFY_SECRET, digest_size=32)
+    mac.update(stored.encode("utf-8"))
+    mac.update(b"\0")
+    mac.update(password.encode("utf-8"))
+    return mac.digest()
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=256 * n * r * p,
+        dklen=SCRYPT_DKLEN,
+    )
+
 
 def hash_password(password: str) -> str:
     if not password:
         raise ValueError("Password cannot be empty.")
     salt = os.urandom(16)
-    dk = hashlib.pbkdf2_hmac(
-        HASH_NAME,
-        password.encode("utf-8"),
-        salt,
-        ITERATIONS,
-    )
-    salt_b64 = base64.b64encode(salt).decode("ascii")
-    dk_b64 = base64.b64encode(dk).decode("ascii")
-    return f"{ITERATIONS}${salt_b64}${dk_b64}"
+    dk = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(dk)}"
 
 
-def verify_password(password: str, stored: str) -> bool:
+def needs_rehash(stored: str) -> bool:
+    """True for legacy PBKDF2 hashes or scrypt hashes with outdated parameters."""
+    return not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+def _verify_scrypt(password: str, stored: str) -> bool:
+    try:
+        _, n, r, p, salt_b64, dk_b64 = stored.split("$", 5)
+        salt = base64.b64decode(salt_b64.encode("ascii"))
+        expected = base64.b64decode(dk_b64.encode("ascii"))
+        dk = _scrypt(password, salt, int(n), int(r), int(p))
+    except Exception:
+        return False
+    return hmac.compare_digest(dk, expected)
+
+
+def _verify_pbkdf2(password: str, stored: str) -> bool:
+    # Legacy format: "<iterations>$<salt>$<dk>".
     try:
         iters_str, salt_b64, dk_b64 = stored.split("$", 2)
         iters = int(iters_str)
@@ -40,3 +91,16 @@ def verify_password(password: str, stored: str) -> bool:
     )
     return hmac.compare_digest(dk, expected)
 
+
+def verify_password(password: str, stored: str) -> bool:
+    key = _verify_key(password, stored)
+    if _VERIFIED.get(key):
+        return True
+    if stored.startswith("scrypt$"):
+        ok = _verify_scrypt(password, stored)
+    else:
+        ok = _verify_pbkdf2(password, stored)
+    if not ok:
+        return False
+    _VERIFIED.set(key, True)
+    return True
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Hashable, Iterator, List, Optional, Tuple
+
+import orjson
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable hex digest for a tuple of JSON-serializable values."""
+    raw = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping. A maxsize of 0 disables caching."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = max(0, int(maxsize))
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of (key, value) pairs; does not refresh recency."""
+        with self._lock:
+            return list(self._data.items())
+
+
+class TTLCache(MutableMapping):
+    """
+    Thread-safe mapping that drops entries idle for more than ttl seconds and
+    evicts the least recently used entry beyond maxsize. Reads and writes both
+    refresh an entry, so recency order is also expiry order.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        data = self._data
+        while data:
+            key, (expires, _) = next(iter(data.items()))
+            if expires > now:
+                break
+            del data[key]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            _, value = self._data[key]
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self._lock:
+            del self._data[key]
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter([key for key, _ in self.items()])
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._data)
+
+    def peek(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return a live value without refreshing its recency or expiry."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return default
+            return entry[1]
+
+    def items(self) -> List[Tuple[Hashable, Any]]:  # type: ignore[override]
+        """Snapshot of live (key, value) pairs; does not refresh recency."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return [(key, value) for key, (_, value) in self._data.items()]
+
+
+class SemanticCache:
+    """
+    FIFO cache of (embedding, params_key, value) rows. A lookup returns the value
+    whose embedding is most similar to the query among rows with the same
+    params_key, provided the cosine similarity reaches the threshold.
+    Requires numpy (imported lazily so the default install stays lean).
+    """
+
+    def __init__(self, *, dim: int, maxsize: int = 2048, threshold: float = 0.93) -> None:
+        import numpy as np
+
+        self._np = np
+        self.maxsize = max(1, int(maxsize))
+        self.threshold = float(threshold)
+        self._vectors = np.zeros((self.maxsize, dim), dtype=np.float32)
+        self._keys = np.empty(self.maxsize, dtype=object)
+        self._values: list[Any] = [None] * self.maxsize
+        self._count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _normalize(self, vector: Any) -> Any:
+        np = self._np
+        vec = np.asarray(vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def get(self, vector: Any, params_key: str) -> Optional[Any]:
+        np = self._np
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._count:
+                return None
+            sims = self._vectors[: self._count] @ query
+            sims[self._keys[: self._count] != params_key] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            return self._values[best]
+
+    def add(self, vector: Any, params_key: str, value: Any) -> None:
+        query = self._normalize(vector)
+        with self._lock:
+            slot = self._next
+            self._vectors[slot] = query
+            self._keys[slot] = params_key
+            self._values[slot] = value
+            self._next = (slot + 1) % self.maxsize
+            self._count = min(self._count + 1, self.maxsize)
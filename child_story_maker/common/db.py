@@ -1,22 +1,60 @@
 from __future__ import annotations
 
+import os
+import secrets
 import sqlite3
-import uuid
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
-from child_story_maker.common.auth import hash_password, verify_password
+from child_story_maker.common.auth import hash_password, needs_rehash, verify_password
+from child_story_maker.common.cache import LRUCache
 from child_story_maker.common.paths import repo_root
 
 DB_PATH = repo_root() / "data" / "app.db"
 
-
-def _connect() -> sqlite3.Connection:
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys=ON;")
-    return conn
+# token -> (monotonic deadline, parent_id) for sessions seen recently. Sessions
+# never change owner; a logout in this process evicts at once, one handled by
+# another process is picked up within SESSION_CACHE_TTL seconds (0 disables).
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "4096"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "30"))
+_SESSIONS = LRUCache(SESSION_CACHE_SIZE if SESSION_CACHE_TTL > 0 else 0)
+
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.RLock()
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Process-wide connection, opened and tuned on first use."""
+    global _conn
+    if _conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON;")
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA cache_size=-65536;")
+        conn.execute("PRAGMA mmap_size=268435456;")
+        _conn = conn
+    return _conn
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """
+    The shared connection, held under a lock for the duration of the block and
+    committed on success / rolled back on error (sqlite3's own `with conn:`).
+    Handlers run on FastAPI's threadpool, hence the lock.
+    """
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            yield conn
 
 
 def init_db() -> None:
@@ -76,9 +114,16 @@ def authenticate_parent(email: str, password: str) -> Optional[int]:
         ).fetchone()
     if not row:
         return None
-    if verify_password(password, row["password_hash"]):
-        return int(row["id"])
-    return None
+    if not verify_password(password, row["password_hash"]):
+        return None
+    if needs_rehash(row["password_hash"]):
+        new_hash = hash_password(password)
+        with _connect() as conn:
+            conn.execute(
+                "UPDATE parents SET password_hash = ? WHERE id = ?",
+                (new_hash, row["id"]),
+            )
+    return int(row["id"])
 
 
 def get_parent(parent_id: int) -> Optional[sqlite3.Row]:
@@ -91,7 +136,7 @@ def get_parent(parent_id: int) -> Optional[sqlite3.Row]:
 
 
 def create_session(parent_id: int) -> str:
-    token = uuid.uuid4().hex
+    token = secrets.token_urlsafe(32)
     now = datetime.utcnow().isoformat()
     with _connect() as conn:
         conn.execute(
@@ -104,14 +149,20 @@ def create_session(parent_id: int) -> str:
 def get_parent_id_for_token(token: str) -> Optional[int]:
     if not token:
         return None
+    cached = _SESSIONS.get(token)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
     with _connect() as conn:
         row = conn.execute(
             "SELECT parent_id FROM sessions WHERE token = ?",
             (token,),
         ).fetchone()
-    if not row:
-        return None
-    return int(row["parent_id"])
+        if not row:
+            return None
+        # Filled under the connection lock so a concurrent logout can't be undone.
+        parent_id = int(row["parent_id"])
+        _SESSIONS.set(token, (time.monotonic() + SESSION_CACHE_TTL, parent_id))
+    return parent_id
 
 
 def delete_session(token: str) -> None:
@@ -119,6 +170,7 @@ def delete_session(token: str) -> None:
         return
     with _connect() as conn:
         conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+        _SESSIONS.pop(token)
 
 
 def list_children(parent_id: int) -> List[sqlite3.Row]:
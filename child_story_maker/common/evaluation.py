@@ -3,6 +3,7 @@ from __future__ import annotations
 import math
 import re
 from datetime import datetime, timezone
+from functools import cache
 from typing import Any, Dict, List, Optional, Tuple
 
 from child_story_maker.common.models import SAFE_WORDS_BLOCKLIST
@@ -50,12 +51,15 @@ def build_story_report(
     story_text = "\n\n".join((s.get("text") or "").strip() for s in sections if s)
     image_prompts = "\n".join((s.get("image_prompt") or "").strip() for s in sections if s)
 
-    word_count = _word_count(story_text)
-    sentence_count = _sentence_count(story_text)
-    fk_grade = _flesch_kincaid_grade(story_text) if _is_english(language) else None
+    word_count, sentence_count, syllables = _text_stats(story_text)
+    fk_grade = (
+        _flesch_kincaid_grade(word_count, sentence_count, syllables)
+        if _is_english(language)
+        else None
+    )
 
-    story_hits = _scan_terms(story_text, _flatten_blocklist(SAFE_WORDS_BLOCKLIST))
-    image_hits = _scan_terms(image_prompts, BAD_IMAGE_TERMS)
+    story_hits = _scan_terms(story_text, _STORY_RE)
+    image_hits = _scan_terms(image_prompts, _IMAGE_RE)
 
     return {
         "story_id": story_id,
@@ -91,19 +95,6 @@ def _flatten_blocklist(blocklist: Dict[str, List[str]]) -> List[str]:
     return terms
 
 
-def _scan_terms(text: str, terms: List[str]) -> List[str]:
-    hits: List[str] = []
-    if not text:
-        return hits
-    for term in terms:
-        pattern = _term_pattern(term)
-        if not pattern:
-            continue
-        if re.search(pattern, text, flags=re.IGNORECASE):
-            hits.append(term.lower())
-    return sorted(set(hits))
-
-
 def _term_pattern(term: str) -> str:
     term = (term or "").strip()
     if not term:
@@ -114,28 +105,109 @@ def _term_pattern(term: str) -> str:
     return r"\b" + r"\s+".join(parts) + r"\b"
 
 
-def _is_english(language: str) -> bool:
-    lang = (language or "").strip().lower()
-    if not lang:
-        return True
-    return lang.startswith("en") or lang.startswith("english")
+def _fused_pattern(terms: List[str]) -> Optional["re.Pattern[str]"]:
+    """
+    One alternation over all terms, so a text is scanned once instead of once
+    per term. Longer terms come first so a multi-word term wins over a term it
+    starts with.
+    """
+    bodies = sorted(
+        {_term_pattern(t)[2:-2] for t in terms if _term_pattern(t)},
+        key=lambda b: (-len(b), b),
+    )
+    if not bodies:
+        return None
+    return re.compile(r"\b(?:" + "|".join(bodies) + r")\b", re.IGNORECASE)
+
 
+def _scan_terms(text: str, pattern: Optional["re.Pattern[str]"]) -> List[str]:
+    if not text or pattern is None:
+        return []
+    return sorted({" ".join(m.group(0).lower().split()) for m in pattern.finditer(text)})
 
-def _word_count(text: str) -> int:
-    words = re.findall(r"[A-Za-z0-9']+", text or "")
-    return int(len(words))
 
+_STORY_RE = _fused_pattern(_flatten_blocklist(SAFE_WORDS_BLOCKLIST))
+_IMAGE_RE = _fused_pattern(BAD_IMAGE_TERMS)
 
-def _sentence_count(text: str) -> int:
-    chunks = re.split(r"[.!?]+", (text or "").strip())
-    chunks = [c.strip() for c in chunks if c.strip()]
-    return int(len(chunks))
 
+# Primary language subtags / names treated as English; "" means unspecified.
+_ENGLISH_LANGS = frozenset({"", "en", "eng", "english"})
 
-def _syllable_count(word: str) -> int:
-    w = re.sub(r"[^a-z]", "", (word or "").lower())
-    if not w:
-        return 0
+
+def _is_english(language: str) -> bool:
+    # "en-US", "en_GB" and "English" match; "enigma" no longer does.
+    lang = (language or "").strip().lower().replace("_", "-")
+    return lang.split("-", 1)[0] in _ENGLISH_LANGS
+
+
+# Words, sentence terminators, and any other visible character (which still
+# makes the text between two terminators count as a sentence).
+_TOKEN_RE = re.compile(r"([.!?]+)|([A-Za-z0-9']+)|\S")
+# Syllables only look at the letters of a word token.
+_NON_LETTERS = str.maketrans("", "", "0123456789'")
+
+
+def _text_stats(text: str) -> Tuple[int, int, int]:
+    """(word_count, sentence_count, syllable_count) from a single scan."""
+    words = 0
+    sentences = 0
+    letters: List[str] = []
+    in_sentence = False
+    for m in _TOKEN_RE.finditer(text or ""):
+        if m.group(1):
+            if in_sentence:
+                sentences += 1
+                in_sentence = False
+            continue
+        in_sentence = True
+        word = m.group(2)
+        if word:
+            words += 1
+            w = word.lower().translate(_NON_LETTERS)
+            if w:
+                letters.append(w)
+    if in_sentence:
+        sentences += 1
+    return words, sentences, _syllables_total(letters)
+
+
+# Stories shorter than this aren't worth the NumPy setup cost.
+_VECTOR_MIN_WORDS = 100
+_VOWEL_LUT = bytes(1 if chr(i) in "aeiouy" else 0 for i in range(256))
+
+
+@cache
+def _numpy() -> Optional[Any]:
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _syllables_total(words: List[str]) -> int:
+    """
+    Sum of _syllable_count over lower-case, letters-only words. With NumPy and
+    enough words, vowel-group starts are found over one joined buffer and
+    summed per word with reduceat instead of looping per character.
+    """
+    np = _numpy() if len(words) >= _VECTOR_MIN_WORDS else None
+    if np is None:
+        return sum(map(_syllable_count, words))
+    buf = np.frombuffer(" ".join(words).encode("ascii"), dtype=np.uint8)
+    vowel = np.frombuffer(_VOWEL_LUT, dtype=np.uint8)[buf].astype(np.int32)
+    starts = vowel.copy()
+    starts[1:] &= 1 - vowel[:-1]
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    offsets = np.zeros(len(words), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=offsets[1:])
+    counts = np.add.reduceat(starts, offsets)
+    silent_e = (buf[offsets + lengths - 1] == ord("e")) & (counts > 1)
+    return int(np.maximum(counts - silent_e, 1).sum())
+
+
+def _syllable_count(w: str) -> int:
+    # `w` is a non-empty, lower-case, letters-only word (see _text_stats).
     vowels = "aeiouy"
     count = 0
     prev_vowel = False
@@ -149,14 +221,10 @@ def _syllable_count(word: str) -> int:
     return max(count, 1)
 
 
-def _flesch_kincaid_grade(text: str) -> Optional[float]:
-    words = re.findall(r"[A-Za-z0-9']+", text or "")
-    if not words:
-        return None
-    word_count = len(words)
-    sentence_count = _sentence_count(text)
-    if sentence_count <= 0:
+def _flesch_kincaid_grade(
+    word_count: int, sentence_count: int, syllables: int
+) -> Optional[float]:
+    if not word_count or sentence_count <= 0:
         return None
-    syllables = sum(_syllable_count(w) for w in words)
     grade = 0.39 * (word_count / sentence_count) + 11.8 * (syllables / word_count) - 15.59
     return round(float(grade), 2)
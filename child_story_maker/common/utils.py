@@ -1,9 +1,12 @@
 import io
-import json
 import re
+import sys
 import zipfile
-from dataclasses import asdict
-from typing import Any, Dict, Optional, Tuple
+from functools import cache, lru_cache
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
 
 from child_story_maker.common.models import *
 
@@ -24,19 +27,95 @@ from child_story_maker.common.models import *
 #     return "\n".join(textwrap.wrap(text, width=width))
 
 
-def kid_safe_prompt(prompt: str) -> Tuple[bool, str]:
+@cache
+def _blocklist_terms() -> Tuple[str, ...]:
+    """Distinct lower-cased blocklist terms with internal whitespace collapsed."""
+    terms = {
+        " ".join((w or "").lower().split())
+        for w in chain.from_iterable(SAFE_WORDS_BLOCKLIST.values())
+    }
+    terms.discard("")
+    return tuple(sorted(terms))
+
+
+@cache
+def _blocklist_automaton() -> Optional[Any]:
+    """Aho-Corasick automaton over the blocklist, or None without pyahocorasick."""
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    automaton = ahocorasick.Automaton()
+    for term in _blocklist_terms():
+        automaton.add_word(term, term)
+    automaton.make_automaton()
+    return automaton
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _automaton_hits(automaton: Any, prompt: str) -> List[str]:
+    # Same semantics as the regex path: whole words, any whitespace between the
+    # words of a multi-word term, case-insensitive.
+    text = " ".join(prompt.lower().split())
     hits = []
-    for _, words in SAFE_WORDS_BLOCKLIST.items():
-        for w in words:
-            term = (w or "").strip()
-            if not term:
-                continue
-            parts = [re.escape(p) for p in term.split() if p.strip()]
-            if not parts:
-                continue
-            pattern = r"\b" + r"\s+".join(parts) + r"\b"
-            if re.search(pattern, prompt, flags=re.IGNORECASE):
-                hits.append(term.lower())
+    for end, term in automaton.iter(text):
+        start = end - len(term) + 1
+        if start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if end + 1 < len(text) and _is_word_char(text[end + 1]):
+            continue
+        hits.append(term)
+    return hits
+
+
+# Atomic groups arrived in Python 3.11's re; older interpreters get a plain group.
+_ATOMIC = "(?>" if sys.version_info >= (3, 11) else "(?:"
+
+
+@cache
+def _blocklist_regex() -> "re.Pattern[str]":
+    """
+    One whole-word alternation over the blocklist, compiled on first use.
+    Longer terms come first so "big bad" wins over "big". Each alternative
+    carries its own closing \\b, so the group can be atomic: once a term
+    matches, the engine never retries the remaining alternatives there.
+    """
+    alts = sorted(
+        {r"\s+".join(re.escape(p) for p in term.split()) for term in _blocklist_terms()},
+        key=lambda alt: (-len(alt), alt),
+    )
+    body = "|".join(alt + r"\b" for alt in alts)
+    return re.compile(r"\b" + _ATOMIC + body + ")", flags=re.IGNORECASE)
+
+
+def _regex_hits(prompt: str) -> List[str]:
+    # Clean prompts are the common case: plain substring tests (C-level) rule
+    # them out before any regex runs. Matches still need the \b check below,
+    # since e.g. "scrape" contains "rape". The shortcut is ASCII-only: IGNORECASE
+    # also folds variants that lower() leaves alone ("ſ" -> "s", Kelvin "K").
+    if prompt.isascii():
+        text = " ".join(prompt.lower().split())
+        if not any(term in text for term in _blocklist_terms()):
+            return []
+    pattern = _blocklist_regex()
+    first = pattern.search(prompt)
+    if first is None:
+        return []
+    hits = pattern.findall(prompt, first.start())
+    return [" ".join(hit.lower().split()) for hit in hits]
+
+
+def kid_safe_prompt(prompt: str) -> Tuple[bool, str]:
+    # The automaton matches lower()-ed text, which misses case variants the
+    # regex's IGNORECASE folding catches ("ſ", Kelvin sign); those are non-ASCII.
+    automaton = _blocklist_automaton() if prompt.isascii() else None
+    if automaton is not None:
+        hits = _automaton_hits(automaton, prompt)
+    else:
+        hits = _regex_hits(prompt)
     if hits:
         return (
             False,
@@ -59,6 +138,7 @@ def age_to_group(age: int) -> str:
     return "9-12 (Middle)"
 
 
+@lru_cache(maxsize=16)
 def is_arabic(lang: str) -> bool:
     return lang.lower().startswith("arab")
 
@@ -70,19 +150,35 @@ def rtl_block(s: str) -> str:
 # -----------------------------
 # Packaging / Exports
 # -----------------------------
+def story_manifest(story: Story) -> bytes:
+    """UTF-8 JSON written as story.json in the ZIP export (no image bytes)."""
+    # Shallow field copies rather than asdict(), which would deep-copy image_bytes.
+    story_dict: Dict[str, Any] = {
+        k: v for k, v in vars(story).items() if k != "chapters"
+    }
+    story_dict["sections"] = [
+        {k: v for k, v in vars(ch).items() if k != "image_bytes"}
+        for ch in story.chapters
+    ]
+    return orjson.dumps(story_dict, option=orjson.OPT_INDENT_2)
+
+
+def chapter_image_name(idx: int) -> str:
+    return f"images/chapter_{idx:02d}.png"
+
+
 def package_story_downloads(story: Story) -> bytes:
-    """Create a ZIP with JSON story + images."""
+    """Create a ZIP with JSON story + images (PNGs are stored, already deflated)."""
     zip_buf = io.BytesIO()
     with zipfile.ZipFile(zip_buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        story_dict: Dict[str, Any] = asdict(story)
-        chapters = story_dict.pop("chapters", [])
-        for ch in chapters:
-            ch.pop("image_bytes", None)
-        story_dict["sections"] = chapters
-        zf.writestr("story.json", json.dumps(story_dict, ensure_ascii=False, indent=2))
+        zf.writestr("story.json", story_manifest(story))
         for idx, ch in enumerate(story.chapters, start=1):
             if ch.image_bytes:
-                zf.writestr(f"images/chapter_{idx:02d}.png", ch.image_bytes)
+                zf.writestr(
+                    chapter_image_name(idx),
+                    ch.image_bytes,
+                    compress_type=zipfile.ZIP_STORED,
+                )
     return zip_buf.getvalue()
 
 
@@ -100,12 +196,14 @@ def build_pdf(story: Story, cover_img_bytes: Optional[bytes]) -> bytes:
     W, H = A4
     c.setTitle(story.title)
 
+    # One stylesheet per document; getSampleStyleSheet() builds a fresh one each call.
+    styles = getSampleStyleSheet()
+    heading = styles["Heading2"]
+    body = styles["BodyText"]
+    body.fontSize = 12
+    body.leading = 16
+
     def draw_text_page(title: str, text: str):
-        styles = getSampleStyleSheet()
-        heading = styles["Heading2"]
-        body = styles["BodyText"]
-        body.fontSize = 12
-        body.leading = 16
         flow = [
             Paragraph(f"<b>{title}</b>", heading),
             Paragraph(text.replace("\n", "<br/>"), body),
@@ -113,8 +211,17 @@ def build_pdf(story: Story, cover_img_bytes: Optional[bytes]) -> bytes:
         frame = Frame(2 * cm, 2 * cm, W - 4 * cm, H - 6 * cm, showBoundary=0)
         frame.addFromList(flow, c)
 
-    def draw_full_bleed_image(image_bytes: bytes):
-        img = ImageReader(io.BytesIO(image_bytes))
+    # ImageReader keeps its decoded pixels, so a picture repeated across pages
+    # (the same URL on several sections) is decoded once per document.
+    readers: Dict[bytes, ImageReader] = {}
+
+    def image_reader(image_bytes: bytes) -> ImageReader:
+        reader = readers.get(image_bytes)
+        if reader is None:
+            reader = readers[image_bytes] = ImageReader(io.BytesIO(image_bytes))
+        return reader
+
+    def draw_full_bleed_image(img: ImageReader):
         iw, ih = img.getSize()
         scale = max(W / iw, H / ih)
         w = iw * scale
@@ -124,11 +231,6 @@ def build_pdf(story: Story, cover_img_bytes: Optional[bytes]) -> bytes:
         c.drawImage(img, x, y, width=w, height=h, preserveAspectRatio=False)
 
     def draw_text_overlay(title: str, text: str):
-        styles = getSampleStyleSheet()
-        heading = styles["Heading2"]
-        body = styles["BodyText"]
-        body.fontSize = 12
-        body.leading = 16
         flow = [
             Paragraph(f"<b>{title}</b>", heading),
             Paragraph(text.replace("\n", "<br/>"), body),
@@ -154,12 +256,12 @@ def build_pdf(story: Story, cover_img_bytes: Optional[bytes]) -> bytes:
         frame.addFromList(flow, c)
 
     if cover_img_bytes:
-        draw_full_bleed_image(cover_img_bytes)
+        draw_full_bleed_image(image_reader(cover_img_bytes))
         c.showPage()
 
     for ch in story.chapters:
         if ch.image_bytes:
-            draw_full_bleed_image(ch.image_bytes)
+            draw_full_bleed_image(image_reader(ch.image_bytes))
             draw_text_overlay(ch.title, ch.text)
             c.showPage()
         else:
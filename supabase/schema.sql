@@ -143,6 +143,52 @@ create policy "Parents manage their story sections"
     )
   );
 
+-- Insert a story and its sections in one round trip (and one transaction).
+-- Runs as the caller, so the row-level security policies above still apply.
+create or replace function public.create_story_with_sections(p_story jsonb, p_sections jsonb)
+returns uuid
+language plpgsql
+security invoker
+set search_path = public
+as $$
+declare
+  v_story_id uuid;
+begin
+  insert into public.stories (
+    title, prompt, age_group, language, style, child_id,
+    model, input_tokens, output_tokens, total_tokens
+  )
+  values (
+    p_story->>'title',
+    p_story->>'prompt',
+    p_story->>'age_group',
+    p_story->>'language',
+    p_story->>'style',
+    nullif(p_story->>'child_id', '')::uuid,
+    p_story->>'model',
+    (p_story->>'input_tokens')::int,
+    (p_story->>'output_tokens')::int,
+    (p_story->>'total_tokens')::int
+  )
+  returning id into v_story_id;
+
+  insert into public.story_sections (story_id, idx, title, text, image_prompt, image_url, audio_url)
+  select
+    v_story_id,
+    (s->>'idx')::int,
+    s->>'title',
+    s->>'text',
+    s->>'image_prompt',
+    s->>'image_url',
+    s->>'audio_url'
+  from jsonb_array_elements(coalesce(p_sections, '[]'::jsonb)) as s;
+
+  return v_story_id;
+end;
+$$;
+
+grant execute on function public.create_story_with_sections(jsonb, jsonb) to authenticated;
+
 -- Public share links (token-based). Creation/deletion is owner-only.
 create table if not exists public.story_shares (
   token uuid primary key default gen_random_uuid(),
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from child_story_maker.backend.adapters import core_adapter
+from child_story_maker.backend.storage import image_cache
+
+
+class ImageCacheKeyTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for patch in (
+            mock.patch.object(image_cache, "IMG_CACHE_DIR", Path(tmp.name)),
+            mock.patch.object(image_cache, "STORY_IMG_CACHE_DISABLE", False),
+            mock.patch.object(
+                core_adapter,
+                "_image_model_candidates",
+                return_value=("gpt-image-1", "dall-e-2"),
+            ),
+            mock.patch.object(core_adapter, "responses_available", return_value=False),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.calls = []
+
+    async def _fake_generate(self, model, prompt, size):
+        self.calls.append((model, size))
+        if model == "gpt-image-1":
+            raise RuntimeError("primary model unavailable")
+        return f"{model}|{size}".encode()
+
+    def _key(self, model, size, prompt):
+        return image_cache.image_key(
+            model, size, core_adapter._sanitize_image_prompt(prompt)
+        )
+
+    async def test_fallback_image_is_cached_under_the_fallback_model(self):
+        with mock.patch.object(
+            core_adapter, "_call_image_generate", side_effect=self._fake_generate
+        ):
+            data = await core_adapter.generate_image_core("a red fox", size="256x256")
+            self.assertEqual(data, b"dall-e-2|256x256")
+            fallback_key = self._key("dall-e-2", "256x256", "a red fox")
+            primary_key = self._key("gpt-image-1", "1024x1024", "a red fox")
+            self.assertIsNotNone(image_cache.get(fallback_key))
+            self.assertIsNone(image_cache.get(primary_key))
+
+            # The primary model is retried first; the fallback then comes from cache.
+            self.calls.clear()
+            again = await core_adapter.generate_image_core("a red fox", size="256x256")
+            self.assertEqual(again, data)
+            self.assertEqual(self.calls, [("gpt-image-1", "1024x1024")])
+
+    async def test_size_spellings_share_one_entry(self):
+        with mock.patch.object(
+            core_adapter, "_call_image_generate", side_effect=self._fake_generate
+        ):
+            await core_adapter.generate_image_core("a blue bird", size=" 512X512 ")
+            self.calls.clear()
+            await core_adapter.generate_image_core("a blue bird", size="512x512")
+            self.assertNotIn(("dall-e-2", "512x512"), self.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
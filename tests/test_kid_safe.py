@@ -0,0 +1,49 @@
+import unittest
+
+from child_story_maker.common import utils
+
+
+class RegexBlocklistTests(unittest.TestCase):
+    def test_blocks_plain_terms(self):
+        self.assertEqual(utils._regex_hits("A story with a GUN"), ["gun"])
+
+    def test_ignores_terms_inside_words(self):
+        self.assertEqual(utils._regex_hits("the cat will scrape the door"), [])
+
+    def test_blocks_unicode_case_variants(self):
+        # "ſ" (long s) and the Kelvin sign fold to "s" / "k" under IGNORECASE
+        # but not under str.lower(), so the ASCII prefilter must not skip them.
+        self.assertEqual(utils._regex_hits("a ſex story"), ["ſex"])
+        self.assertEqual(utils._regex_hits("Kill the dragon"), ["kill"])
+
+
+SAMPLES = [
+    "a bunny learns sharing",
+    "A story with a GUN",
+    "the cat will scrape the door",
+    "big\tbad wolf and his knives",
+    "a \u017fex story",
+    "\u212aill the dragon",
+    "Drugs, alcohol; and blood!",
+    "caf\u00e9 with a murderer",
+]
+
+
+class KidSafePromptTests(unittest.TestCase):
+    def test_blocks_unicode_case_variants(self):
+        for prompt in ("a \u017fex story", "\u212aill the dragon"):
+            self.assertFalse(utils.kid_safe_prompt(prompt)[0], prompt)
+
+    @unittest.skipIf(utils._blocklist_automaton() is None, "pyahocorasick not installed")
+    def test_automaton_matches_regex(self):
+        automaton = utils._blocklist_automaton()
+        for prompt in SAMPLES:
+            expected = sorted(set(utils._regex_hits(prompt)))
+            if prompt.isascii():
+                got = sorted(set(utils._automaton_hits(automaton, prompt)))
+                self.assertEqual(got, expected, prompt)
+            self.assertEqual(utils.kid_safe_prompt(prompt)[0], not expected, prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import unittest
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from child_story_maker.backend.adapters import core_adapter
+
+
+class NormalizeSectionTests(unittest.TestCase):
+    def test_primary_keys_win_when_filled(self):
+        sec = core_adapter._normalize_section(
+            {"text": "Once.", "content": "Other.", "title": "T", "name": "N"}, 1
+        )
+        self.assertEqual((sec["text"], sec["title"]), ("Once.", "T"))
+
+    def test_null_or_empty_primary_keys_fall_back(self):
+        for empty in (None, ""):
+            sec = core_adapter._normalize_section(
+                {
+                    "text": empty,
+                    "content": "The bunny hopped.",
+                    "title": empty,
+                    "heading": "Hop",
+                    "image_prompt": empty,
+                    "prompt": "a bunny hopping",
+                },
+                2,
+            )
+            self.assertEqual(sec["text"], "The bunny hopped.")
+            self.assertEqual(sec["title"], "Hop")
+            self.assertEqual(sec["image_prompt"], "a bunny hopping")
+
+    def test_missing_text_is_rejected(self):
+        with self.assertRaises(RuntimeError):
+            core_adapter._normalize_section({"text": None, "content": ""}, 1)
+
+
+class SectionStreamParserTests(unittest.TestCase):
+    STORY = (
+        '{"title": "T", "tags": [{"text": "not a section"}], '
+        '"meta": {"sections": [{"text": "nested"}]}, '
+        '"sections": [{"id": 1, "text": "One [x] {y}"}, {"id": 2, "text": "Two"}], '
+        '"extras": [{"text": "after"}]}'
+    )
+
+    def _feed(self, step):
+        parser = core_adapter._SectionStreamParser()
+        out = []
+        for i in range(0, len(self.STORY), step):
+            out.extend(parser.feed(self.STORY[i : i + step]))
+        return out
+
+    def test_only_sections_items_are_emitted(self):
+        for step in (1, 7, len(self.STORY)):
+            self.assertEqual(
+                [sec["text"] for sec in self._feed(step)], ["One [x] {y}", "Two"], step
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
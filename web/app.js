@@ -279,14 +279,7 @@ async function api(path, options = {}) {
     ...options,
   });
   if (!resp.ok) {
-    let detail = resp.statusText;
-    try {
-      const data = await resp.json();
-      detail = data.detail || JSON.stringify(data);
-    } catch (err) {
-      // ignore
-    }
-    throw new Error(detail);
+    throw await responseError(resp);
   }
   const contentType = resp.headers.get("content-type") || "";
   if (contentType.includes("application/json")) {
@@ -295,6 +288,45 @@ async function api(path, options = {}) {
   return null;
 }
 
+async function responseError(resp) {
+  let detail = resp.statusText;
+  try {
+    const data = await resp.json();
+    detail = data.detail || JSON.stringify(data);
+  } catch (err) {
+    // ignore
+  }
+  return new Error(detail);
+}
+
+// POST a JSON body and call onEvent for each line of an NDJSON response.
+async function streamApi(path, payload, onEvent) {
+  const resp = await fetch(apiUrl(path), {
+    method: "POST",
+    headers: await authHeaders({ json: true }),
+    body: JSON.stringify(payload),
+  });
+  if (!resp.ok) {
+    throw await responseError(resp);
+  }
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline = buffer.indexOf("\n");
+    while (newline >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onEvent(JSON.parse(line));
+      newline = buffer.indexOf("\n");
+    }
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
+
 async function loadSession() {
   if (USE_SUPABASE) {
     try {
@@ -458,10 +490,28 @@ async function generateStory(payload) {
   playAllBtn.classList.add("hidden");
   readerBtn.classList.add("hidden");
 
-  const story = await api("/story", {
-    method: "POST",
-    body: JSON.stringify(payload),
+  // Render sections as they stream in; the final "story" event is authoritative.
+  const draft = { title: payload.title || "", sections: [] };
+  let story = null;
+  let streamError = "";
+  await streamApi("/story/stream", payload, (event) => {
+    if (event.type === "section") {
+      draft.sections.push(event.section);
+      storyStatus.textContent = `Writing story (${draft.sections.length}/${payload.sections})...`;
+      renderStorySections(draft, storyPanel);
+    } else if (event.type === "image") {
+      const idx = draft.sections.findIndex((s) => s.id === event.section.id);
+      if (idx >= 0) draft.sections[idx] = { ...draft.sections[idx], ...event.section };
+      const ready = draft.sections.filter((s) => s.image_url).length;
+      storyStatus.textContent = `Drawing pictures (${ready}/${draft.sections.length})...`;
+      renderStorySections(draft, storyPanel);
+    } else if (event.type === "story") {
+      story = event.story;
+    } else if (event.type === "error") {
+      streamError = event.detail;
+    }
   });
+  if (!story) throw new Error(streamError || "Story stream ended unexpectedly.");
   state.story = story;
   renderStory(story);
   loadLibrary();
@@ -1019,14 +1069,15 @@ storyForm.addEventListener("submit", async (event) => {
     style: formData.get("style"),
     title: formData.get("title") || "",
     child_id: String(child.id),
-    generate_images: false,
+    generate_images: wantImages,
     image_style: formData.get("image_style"),
     image_size: "512x512",
   };
 
   try {
     await generateStory(payload);
-    if (wantImages && state.story?.story_id) {
+    // Images are generated alongside the stream; retry any that failed.
+    if (wantImages && state.story?.sections?.some((s) => !s.image_url)) {
       await generateImagesPerSection(
         state.story.story_id,
         payload.image_size,